@@ -0,0 +1,156 @@
+"""
+Local stand-in for letterboxd.com and api.imdbapi.dev, for load tests.
+
+    python -m bench.fake_upstream --port 8765 --latency-ms 80 --rate-429 0.02
+
+then run the API with
+    LETTERBOXD_BASE_URL=http://127.0.0.1:8765 IMDB_API_BASE_URL=http://127.0.0.1:8765
+
+Users are synthetic: "<name>-<n>" has n rated films (default --films), names
+starting with "missing" get Letterboxd's error page. Films come from a shared
+pool so per-film Mongo lookups start hitting once the pool has been seen.
+"""
+import argparse
+import asyncio
+import random
+import zlib
+from collections import Counter
+from html import escape
+
+from aiohttp import web
+
+from bench.synthetic import make_catalog
+
+PER_PAGE = 72  # Letterboxd grid size
+
+
+class FakeUpstream:
+    def __init__(self, pool=5_000, films=300, latency_ms=50.0, jitter_ms=25.0, rate_429=0.0, seed=0):
+        self.pool = make_catalog(pool, seed=seed)
+        self.default_films = films
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.stats = Counter()
+
+    # ----------------- app wiring -----------------
+    def make_app(self):
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/_stats", self._stats)
+        app.router.add_get("/titles/{imdb_id}", self._title_json)
+        app.router.add_get("/film/{slug}/", self._film_page)
+        app.router.add_get("/{user}/films/", self._films_page)
+        app.router.add_get("/{user}/films/page/{page}/", self._films_page)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        if request.path == "/_stats":
+            return await handler(request)
+        kind = (
+            "imdb_title" if request.path.startswith("/titles/")
+            else "film_page" if request.path.startswith("/film/")
+            else "grid_page"
+        )
+        self.stats[kind] += 1
+        delay = max(self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms), 0.0)
+        await asyncio.sleep(delay / 1000)
+        if self.rate_429 and random.random() < self.rate_429:
+            self.stats["429"] += 1
+            return web.Response(status=429, text="Too Many Requests")
+        return await handler(request)
+
+    async def _stats(self, request):
+        return web.json_response(dict(self.stats))
+
+    # ----------------- synthetic users -----------------
+    def _user_films(self, user):
+        """Deterministic (film index, rating) list for a username."""
+        size = self.default_films
+        head, _, tail = user.rpartition("-")
+        if head and tail.isdigit():
+            size = int(tail)
+        rng = random.Random(zlib.crc32(user.encode("utf-8")))
+        picks = rng.sample(range(len(self.pool)), min(size, len(self.pool)))
+        return [(i, rng.randint(1, 10)) for i in picks]
+
+    async def _films_page(self, request):
+        user = request.match_info["user"]
+        if user.startswith("missing"):
+            return web.Response(text="<html><body class=\"error\">Sorry, we can’t find the page</body></html>",
+                                content_type="text/html")
+        page = int(request.match_info.get("page", 1))
+        films = self._user_films(user)
+        n_pages = max((len(films) + PER_PAGE - 1) // PER_PAGE, 1)
+        items = []
+        for i, rating in films[(page - 1) * PER_PAGE: page * PER_PAGE]:
+            title = escape(self.pool[i]["title"])
+            items.append(
+                f'<li class="griditem"><div class="react-component" data-item-link="/film/film-{i}/">'
+                f'<img alt="{title}"/></div>'
+                f'<p class="poster-viewingdata"><span class="rating rated-{rating}"></span></p></li>'
+            )
+        pagination = ""
+        if n_pages > 1:
+            pagination = "<ul>" + "".join(
+                f'<li class="paginate-page"><a href="/{user}/films/page/{p}/">{p}</a></li>'
+                for p in range(1, n_pages + 1)
+            ) + "</ul>"
+        html = f'<html><body><ul class="grid">{"".join(items)}</ul>{pagination}</body></html>'
+        return web.Response(text=html, content_type="text/html")
+
+    async def _film_page(self, request):
+        i = int(request.match_info["slug"].rsplit("-", 1)[-1])
+        html = (
+            f'<html><body><h1>{escape(self.pool[i]["title"])}</h1>'
+            f'<p class="text-link text-footer">'
+            f'<a data-track-action="IMDb" href="http://www.imdb.com/title/tt{i:07d}/maindetails">IMDb</a></p>'
+            f"</body></html>"
+        )
+        return web.Response(text=html, content_type="text/html")
+
+    async def _title_json(self, request):
+        i = int(request.match_info["imdb_id"][2:])
+        if i >= len(self.pool):
+            return web.json_response({"code": 5, "message": "not found"}, status=404)
+        d = self.pool[i]
+        return web.json_response({
+            "id": f"tt{i:07d}",
+            "type": "movie",
+            "primaryTitle": d["title"],
+            "primaryImage": {"url": d["poster"]},
+            "startYear": d["year"],
+            "runtimeSeconds": 6000,
+            "genres": d["genres"],
+            "rating": {"aggregateRating": d["average"], "voteCount": d["votes"]},
+            "plot": d["overview"],
+        })
+
+
+async def start(host="127.0.0.1", port=8765, **opts):
+    """Start the stand-in on the running loop; returns (runner, FakeUpstream)."""
+    upstream = FakeUpstream(**opts)
+    runner = web.AppRunner(upstream.make_app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, upstream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pool", type=int, default=5_000, help="distinct films shared by all users")
+    parser.add_argument("--films", type=int, default=300, help="rated films per user without a -<n> suffix")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=25.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probability of answering 429")
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(pool=args.pool, films=args.films, latency_ms=args.latency_ms,
+                            jitter_ms=args.jitter_ms, rate_429=args.rate_429)
+    web.run_app(upstream.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
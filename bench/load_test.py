@@ -0,0 +1,186 @@
+"""
+End-to-end load test: real FastAPI app + local fake Letterboxd/IMDb upstream.
+
+    python -m bench.load_test --concurrency 20 --duration 60 --users 200
+
+Starts bench.fake_upstream in-process and the API under uvicorn in a
+subprocess pointed at it (LETTERBOXD_BASE_URL / IMDB_API_BASE_URL), then
+drives a mix of /ratings and /recommendations traffic and reports throughput,
+latency percentiles and outbound request counts (from the stand-in and the
+app's /metrics).
+
+Needs a local Mongo; data goes to --mongo-db (default reelhottakes_loadtest),
+never the production "Movies" database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+
+import aiohttp
+import numpy as np
+
+from bench import fake_upstream
+
+
+async def _wait_ready(session, url, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"API did not come up at {url}")
+
+
+async def _fetch(session, url):
+    async with session.get(url) as resp:
+        await resp.read()
+        return resp.status
+
+
+def _start_app(args, upstream_url):
+    env = {
+        **os.environ,
+        "LETTERBOXD_BASE_URL": upstream_url,
+        "IMDB_API_BASE_URL": upstream_url,
+        "MONGO_URI": args.mongo_uri,
+        "MONGO_DB": args.mongo_db,
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(args.app_port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+
+
+def _outbound_from_metrics(text):
+    out = {}
+    for line in text.splitlines():
+        if line.startswith("rht_outbound_requests_total{"):
+            labels, value = line.rsplit(" ", 1)
+            out[labels[len("rht_outbound_requests_total"):]] = int(float(value))
+    return out
+
+
+async def _worker(session, base, users, args, lat, status, stop_at):
+    while time.monotonic() < stop_at:
+        user = random.choice(users)
+        if random.random() < args.ratings_share:
+            kind, url = "ratings", f"{base}/users/{user}/ratings"
+        else:
+            kind, url = "recommendations", f"{base}/users/{user}/recommendations?k={args.k}"
+        t0 = time.perf_counter()
+        try:
+            status[(kind, await _fetch(session, url))] += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status[(kind, "error")] += 1
+        lat[kind].append((time.perf_counter() - t0) * 1000)
+
+
+async def run(args):
+    runner, upstream = await fake_upstream.start(
+        port=args.upstream_port, pool=args.pool, films=args.films,
+        latency_ms=args.latency_ms, jitter_ms=args.latency_ms / 2, rate_429=args.rate_429,
+    )
+    upstream_url = f"http://127.0.0.1:{args.upstream_port}"
+    app = None if args.app_url else _start_app(args, upstream_url)
+    base = args.app_url or f"http://127.0.0.1:{args.app_port}"
+
+    # Profile sizes spread over --min-films..--max-films via the "-<n>" username suffix
+    rng = random.Random(args.seed)
+    users = [f"load{i}-{rng.randint(args.min_films, args.max_films)}" for i in range(args.users)]
+
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    try:
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            await _wait_ready(session, base + "/")
+            if args.warmup:
+                # Seed UserRatings so /recommendations has something to score
+                await asyncio.gather(*(_fetch(session, f"{base}/users/{u}/ratings") for u in users[: args.warmup]))
+            upstream.stats.clear()
+
+            lat = defaultdict(list)
+            status = Counter()
+            t0 = time.monotonic()
+            stop_at = t0 + args.duration
+            await asyncio.gather(*(
+                _worker(session, base, users, args, lat, status, stop_at) for _ in range(args.concurrency)
+            ))
+            elapsed = time.monotonic() - t0
+
+            async with session.get(base + "/metrics") as resp:
+                app_outbound = _outbound_from_metrics(await resp.text()) if resp.status == 200 else {}
+    finally:
+        if app is not None:
+            app.terminate()
+            app.wait(timeout=10)
+        await runner.cleanup()
+
+    report = {
+        "config": vars(args),
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": sum(status.values()),
+        "throughput_rps": round(sum(status.values()) / elapsed, 2),
+        "status": {f"{k}:{s}": n for (k, s), n in sorted(status.items(), key=str)},
+        "latency_ms": {
+            kind: {
+                "count": len(v),
+                "p50": round(float(np.percentile(v, 50)), 1),
+                "p90": round(float(np.percentile(v, 90)), 1),
+                "p99": round(float(np.percentile(v, 99)), 1),
+                "max": round(float(max(v)), 1),
+            } for kind, v in lat.items() if v
+        },
+        "upstream_requests": dict(upstream.stats),
+        "app_outbound_requests": app_outbound,
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured traffic")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--min-films", type=int, default=50)
+    parser.add_argument("--max-films", type=int, default=800)
+    parser.add_argument("--ratings-share", type=float, default=0.5, help="share of /ratings vs /recommendations")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=10, help="users synced before measuring")
+    parser.add_argument("--request-timeout", type=float, default=300.0)
+    parser.add_argument("--pool", type=int, default=5_000)
+    parser.add_argument("--films", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--upstream-port", type=int, default=8765)
+    parser.add_argument("--app-port", type=int, default=8001)
+    parser.add_argument("--app-url", help="drive an already running API instead of starting one "
+                                          "(it must already point at the stand-in)")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument("--mongo-db", default="reelhottakes_loadtest")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write the JSON report here as well")
+    args = parser.parse_args()
+
+    if args.mongo_db == "Movies":
+        parser.error("refusing to load-test against the production 'Movies' database")
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
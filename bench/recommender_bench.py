@@ -0,0 +1,180 @@
+"""
+Offline recommender benchmark on synthetic catalogs (no Mongo needed).
+
+    python -m bench.recommender_bench --rows 10000 100000 --queries 200
+    python -m bench.recommender_bench --rows 50000 --vectorizer hashing
+    python -m bench.recommender_bench --compare bench/results/<old>.json bench/results/<new>.json
+
+Each run writes bench/results/<git-sha>[-<tag>].json with build time, peak
+memory, catalog_stats(), title-mapping throughput and per-query latency.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from bench.synthetic import FakeCollection, make_catalog, make_rating_history
+from services import recommender
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _git_sha():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def _percentiles(samples_ms):
+    a = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(a, 50)), 3),
+        "p90_ms": round(float(np.percentile(a, 90)), 3),
+        "p99_ms": round(float(np.percentile(a, 99)), 3),
+        "max_ms": round(float(a.max()), 3),
+    }
+
+
+def bench_size(n_rows, args):
+    catalog = make_catalog(n_rows, seed=args.seed)
+    coll = FakeCollection(catalog)
+    load_opts = {"force": True}   # an identical catalog would otherwise be kept without refitting
+    if args.vectorizer:
+        load_opts["vectorizer"] = args.vectorizer
+    if args.max_features:
+        load_opts["max_features"] = args.max_features
+    if args.min_df:
+        load_opts["min_df"] = args.min_df
+
+    # --- build: peak allocations from a traced build, then wall time from an untraced one.
+    # tracemalloc slows numpy/sklearn allocation several-fold, so it must not overlap the timing;
+    # the untraced build runs last so catalog_stats() also reports its build_seconds.
+    tracemalloc.start()
+    asyncio.run(recommender.load_catalog(coll, **load_opts))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    t0 = time.perf_counter()
+    asyncio.run(recommender.load_catalog(coll, **load_opts))
+    build_s = time.perf_counter() - t0
+
+    histories = [
+        make_rating_history(catalog, args.ratings, seed=args.seed + q, miss_rate=args.miss_rate)
+        for q in range(args.queries)
+    ]
+
+    # --- title mapping throughput, split by whether the fuzzy fallback was needed
+    cat = recommender.current_catalog()
+    exact_ms, fuzzy_ms = [], []
+    for movie in (m for h in histories[: max(1, args.queries // 10)] for m in h):
+        title = movie["title"]
+        direct = (
+            cat.by_title_year(recommender.film_key(title, movie.get("year"))) is not None
+            or cat.by_title(title.lower()) is not None
+            or cat.by_title(recommender.norm_title(title)) is not None
+        )
+        t = time.perf_counter()
+        recommender._map_movie_to_row(cat, movie)
+        (exact_ms if direct else fuzzy_ms).append((time.perf_counter() - t) * 1000)
+    mapped = len(exact_ms) + len(fuzzy_ms)
+    mapping_s = (sum(exact_ms) + sum(fuzzy_ms)) / 1000
+
+    # --- end-to-end query latency
+    query_ms = []
+    for h in histories:
+        t = time.perf_counter()
+        recommender.recommend_from_ratings(h, k=args.k, min_votes=args.min_votes)
+        query_ms.append((time.perf_counter() - t) * 1000)
+
+    return {
+        "rows": n_rows,
+        "build_seconds": round(build_s, 3),
+        "build_peak_bytes": int(peak),
+        "catalog": recommender.catalog_stats(),
+        "mapping": {
+            "titles": mapped,
+            "titles_per_second": round(mapped / mapping_s, 1) if mapping_s else None,
+            "exact": _percentiles(exact_ms) if exact_ms else None,
+            "fuzzy": _percentiles(fuzzy_ms) if fuzzy_ms else None,
+            "fuzzy_share": round(len(fuzzy_ms) / mapped, 3) if mapped else 0.0,
+        },
+        "recommend": {"queries": len(query_ms), **_percentiles(query_ms)},
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {r["rows"]: r for r in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {r["rows"]: r for r in json.load(f)["results"]}
+
+    metrics = [
+        ("build_seconds", lambda r: r["build_seconds"]),
+        ("build_peak_bytes", lambda r: r["build_peak_bytes"]),
+        ("matrix_bytes", lambda r: r["catalog"]["matrix_bytes"]),
+        ("map_titles_per_s", lambda r: r["mapping"]["titles_per_second"]),
+        ("recommend_p50_ms", lambda r: r["recommend"]["p50_ms"]),
+        ("recommend_p99_ms", lambda r: r["recommend"]["p99_ms"]),
+    ]
+    print(f"{'rows':>9}  {'metric':<18} {'old':>14} {'new':>14} {'ratio':>7}")
+    for rows in sorted(set(old) & set(new)):
+        for name, get in metrics:
+            a, b = get(old[rows]), get(new[rows])
+            ratio = f"{b / a:.2f}x" if a and b is not None else "-"
+            print(f"{rows:>9}  {name:<18} {a!s:>14} {b!s:>14} {ratio:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--ratings", type=int, default=300, help="films per synthetic user")
+    parser.add_argument("--miss-rate", type=float, default=0.05, help="share of rated titles not in the catalog")
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--min-votes", type=int, default=0)
+    parser.add_argument("--vectorizer", choices=["tfidf", "hashing"])
+    parser.add_argument("--max-features", type=int)
+    parser.add_argument("--min-df", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tag", default="", help="suffix for the results file name")
+    parser.add_argument("--out", help="results path (default bench/results/<sha>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = []
+    for n in args.rows:
+        r = bench_size(n, args)
+        results.append(r)
+        print(f"[bench] rows={n} build={r['build_seconds']}s peak={r['build_peak_bytes'] / 2**20:.1f}MiB "
+              f"map={r['mapping']['titles_per_second']}/s recommend p50={r['recommend']['p50_ms']}ms "
+              f"p99={r['recommend']['p99_ms']}ms")
+
+    sha = _git_sha()
+    out = args.out or os.path.join(RESULTS_DIR, f"{sha}{'-' + args.tag if args.tag else ''}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "commit": sha,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+            "results": results,
+        }, f, indent=2)
+    print(f"[bench] wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Synthetic catalog + rating histories for offline benchmarks.
+Docs use the same field names as `Movie Data`, and FakeCollection mimics the
+small slice of the Motor API that load_catalog touches.
+"""
+import string
+from typing import Any, Dict, List
+
+import numpy as np
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Documentary",
+    "Drama", "Family", "Fantasy", "History", "Horror", "Music", "Musical", "Mystery",
+    "Romance", "Sci-Fi", "Sport", "Thriller", "War", "Western",
+]
+_TITLE_WORDS = [
+    "night", "last", "dark", "city", "love", "house", "dead", "man", "woman", "girl",
+    "king", "war", "blood", "river", "secret", "star", "story", "dream", "road", "fire",
+    "ghost", "summer", "winter", "heart", "shadow", "return", "island", "empire", "game", "lost",
+]
+_ARTICLES = ["", "", "", "The ", "A ", "An "]
+
+
+def _pseudo_words(rng, n):
+    # Zipf-ish vocabulary so overview term frequencies look like real text
+    lengths = rng.integers(3, 10, size=n)
+    letters = np.array(list(string.ascii_lowercase))
+    return ["".join(rng.choice(letters, size=l)) for l in lengths]
+
+
+def make_catalog(n_rows, seed=0) -> List[Dict[str, Any]]:
+    """n_rows docs that all pass load_catalog's votes > 100k cut."""
+    rng = np.random.default_rng(seed)
+    vocab = _pseudo_words(rng, 5_000)
+    zipf_p = 1.0 / np.arange(1, len(vocab) + 1)
+    zipf_p /= zipf_p.sum()
+
+    years = rng.integers(1930, 2025, size=n_rows)
+    averages = np.clip(rng.normal(6.6, 0.9, size=n_rows), 1.0, 9.5).round(1)
+    votes = (100_001 + rng.lognormal(11.0, 1.2, size=n_rows)).astype(np.int64)
+
+    # Draw every overview/title word up front; per-row rng.choice with p= is O(vocab) each call
+    overview_lens = rng.integers(20, 60, size=n_rows)
+    overview_offsets = np.concatenate([[0], np.cumsum(overview_lens)])
+    overview_words = rng.choice(len(vocab), size=int(overview_offsets[-1]), p=zipf_p)
+    title_lens = rng.integers(1, 4, size=n_rows)
+    title_offsets = np.concatenate([[0], np.cumsum(title_lens)])
+    title_words = rng.integers(0, len(_TITLE_WORDS), size=int(title_offsets[-1]))
+    articles = rng.integers(0, len(_ARTICLES), size=n_rows)
+    genre_counts = rng.integers(1, 4, size=n_rows)
+
+    docs = []
+    seen = set()
+    for i in range(n_rows):
+        words = title_words[title_offsets[i]:title_offsets[i + 1]]
+        title = _ARTICLES[articles[i]] + " ".join(_TITLE_WORDS[w].capitalize() for w in words)
+        if title in seen:  # keep titles unique like the upsert key
+            title = f"{title} {i}"
+        seen.add(title)
+        docs.append({
+            "title": title,
+            "genres": [GENRES[g] for g in rng.choice(len(GENRES), size=genre_counts[i], replace=False)],
+            "overview": " ".join(vocab[w] for w in overview_words[overview_offsets[i]:overview_offsets[i + 1]]),
+            "average": float(averages[i]),
+            "votes": int(votes[i]),
+            "year": int(years[i]),
+            "poster": f"https://example.invalid/poster/{i}.jpg",
+        })
+    return docs
+
+
+def _perturb_title(rng, title):
+    """Letterboxd and IMDb disagree on articles, case and punctuation."""
+    roll = rng.random()
+    if roll < 0.1 and title.startswith("The "):
+        return title[4:] + ", The"
+    if roll < 0.2:
+        return title.lower()
+    if roll < 0.25:
+        return title + ":"
+    return title
+
+
+def make_rating_history(catalog, n_ratings, seed=0, miss_rate=0.05) -> List[Dict[str, Any]]:
+    """
+    Popularity-weighted sample of rated films. Ratings track the film's average
+    with noise on a 1-10 scale; `miss_rate` of titles are not in the catalog so
+    the fuzzy mapping path gets exercised.
+    """
+    rng = np.random.default_rng(seed)
+    votes = np.array([d["votes"] for d in catalog], dtype=np.float64)
+    p = votes / votes.sum()
+    n_ratings = min(n_ratings, len(catalog))
+    picks = rng.choice(len(catalog), size=n_ratings, replace=False, p=p)
+
+    ratings = []
+    for i in picks:
+        d = catalog[int(i)]
+        if rng.random() < miss_rate:
+            title = "Unlisted " + " ".join(rng.choice(_TITLE_WORDS, size=2))
+        else:
+            title = _perturb_title(rng, d["title"])
+        user_rating = int(np.clip(round(d["average"] + rng.normal(0, 2)), 1, 10))
+        ratings.append({
+            "title": title,
+            "year": d["year"],
+            "user_rating": user_rating,
+            "average": d["average"],
+            "votes": d["votes"],
+        })
+    return ratings
+
+
+class _FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def limit(self, n):
+        self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return list(self._docs) if length is None else list(self._docs[:length])
+
+
+class FakeCollection:
+    """In-memory stand-in for the `Movie Data` collection (find + $gt filters only)."""
+
+    def __init__(self, docs):
+        self._docs = docs
+
+    def find(self, filter=None, projection=None):
+        docs = self._docs
+        for field, cond in (filter or {}).items():
+            if isinstance(cond, dict) and "$gt" in cond:
+                docs = [d for d in docs if (d.get(field) or 0) > cond["$gt"]]
+            else:
+                docs = [d for d in docs if d.get(field) == cond]
+        if projection:
+            keep = [k for k, v in projection.items() if v and k != "_id"]
+            docs = [{k: d[k] for k in keep if k in d} for d in docs]
+        return _FakeCursor(docs)
@@ -6,6 +6,7 @@ load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
 client = AsyncIOMotorClient(MONGO_URI)
-db = client["Movies"]
+db = client[os.getenv("MONGO_DB", "Movies")]
 collection = db["Movie Data"]
-user_ratings_collection = db["UserRatings"] 
\ No newline at end of file
+user_ratings_collection = db["UserRatings"]
+hot_takes_collection = db["HotTakes"]
@@ -0,0 +1,148 @@
+import asyncio
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Upper bounds in seconds; one extra implicit +Inf bucket
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.n += 1
+
+
+_stage_seconds: Dict[str, Histogram] = defaultdict(Histogram)
+_outbound: Dict[Tuple[str, str], int] = defaultdict(int)      # (host, status|"error") -> count
+_cache: Dict[Tuple[str, str], int] = defaultdict(int)         # (cache, "hit"|"miss") -> count
+_gauges: Dict[str, float] = {}
+_loop_lag = Histogram()
+
+# Per-request (stage, start, end) perf_counter spans, set by the timing middleware
+_request_timings: ContextVar[Optional[List[Tuple[str, float, float]]]] = ContextVar("request_timings", default=None)
+
+
+@contextmanager
+def timed(stage):
+    """Record wall time of the block under `stage` (also into the current request's breakdown)."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t1 = time.perf_counter()
+        _stage_seconds[stage].observe(t1 - t0)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, t0, t1))
+
+
+def record_outbound(url, status=None):
+    """Count an outbound HTTP call by host; status=None means it raised."""
+    host = urlsplit(url).netloc or "unknown"
+    _outbound[(host, str(status) if status is not None else "error")] += 1
+
+
+def record_cache(name, hit):
+    _cache[(name, "hit" if hit else "miss")] += 1
+
+
+def set_gauge(name, value):
+    _gauges[name] = float(value)
+
+
+def start_request_timings() -> List[Tuple[str, float, float]]:
+    timings: List[Tuple[str, float, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def summarize_timings(timings) -> Dict[str, Tuple[int, float]]:
+    """
+    stage -> (count, wall seconds). Spans of a stage often run concurrently (one per
+    film), so wall time is the length of the union of its spans, never more than the request.
+    """
+    spans: Dict[str, List[Tuple[float, float]]] = {}
+    for stage, t0, t1 in timings:
+        spans.setdefault(stage, []).append((t0, t1))
+    summary = {}
+    for stage, intervals in spans.items():
+        wall = 0.0
+        cur_start = cur_end = None
+        for t0, t1 in sorted(intervals):
+            if cur_end is None or t0 > cur_end:
+                if cur_end is not None:
+                    wall += cur_end - cur_start
+                cur_start, cur_end = t0, t1
+            else:
+                cur_end = max(cur_end, t1)
+        wall += cur_end - cur_start
+        summary[stage] = (len(intervals), wall)
+    return summary
+
+
+def server_timing_header(timings, total):
+    """Format a Server-Timing header: per-stage wall time with the span count as desc."""
+    parts = [
+        f'{stage.replace(".", "-")};desc="n={count}";dur={wall * 1000:.1f}'
+        for stage, (count, wall) in summarize_timings(timings).items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Sample how late the event loop wakes up from a sleep; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        t0 = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - t0 - interval, 0.0)
+        _loop_lag.observe(lag)
+        _gauges["event_loop_lag_last_seconds"] = lag
+
+
+def _histogram_lines(name, labels, h):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(list(BUCKETS) + ["+Inf"], h.counts):
+        cumulative += count
+        le = bound if bound == "+Inf" else repr(bound)
+        lines.append(f'{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+    label_set = f"{{{labels.rstrip(',')}}}" if labels else ""
+    lines.append(f"{name}_sum{label_set} {h.total:.6f}")
+    lines.append(f"{name}_count{label_set} {h.n}")
+    return lines
+
+
+def render_prometheus():
+    """Prometheus text exposition of everything recorded in this process."""
+    lines = ["# TYPE rht_stage_seconds histogram"]
+    for stage, h in sorted(_stage_seconds.items()):
+        lines += _histogram_lines("rht_stage_seconds", f'stage="{stage}",', h)
+
+    lines.append("# TYPE rht_outbound_requests_total counter")
+    for (host, status), n in sorted(_outbound.items()):
+        lines.append(f'rht_outbound_requests_total{{host="{host}",status="{status}"}} {n}')
+
+    lines.append("# TYPE rht_cache_requests_total counter")
+    for (name, result), n in sorted(_cache.items()):
+        lines.append(f'rht_cache_requests_total{{cache="{name}",result="{result}"}} {n}')
+
+    lines.append("# TYPE rht_event_loop_lag_seconds histogram")
+    lines += _histogram_lines("rht_event_loop_lag_seconds", "", _loop_lag)
+
+    for name, value in sorted(_gauges.items()):
+        lines.append(f"# TYPE rht_{name} gauge")
+        lines.append(f"rht_{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -1,15 +1,27 @@
 from __future__ import annotations
+import asyncio
+import json
+import os
+import time
 from typing import List, Dict, Any, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 from core.db import collection, user_ratings_collection
+from core.metrics import (
+    timed, set_gauge, render_prometheus, monitor_loop_lag,
+    start_request_timings, server_timing_header, summarize_timings,
+)
 from scraping.scraper import scrape_user
 from services.scoring import calculate_hotness
-from services.recommender import load_catalog, recommend_from_ratings
+from services.recommender import load_catalog, ensure_catalog, catalog_stats
+from services.rec_pages import first_page, next_page, RANK_DEPTH
 from services.ratings_service import get_user_ratings_or_sync
+from services.leaderboard import ensure_indexes, top_hot_takes, film_hot_takes
+from services.user_similarity import ensure_user_index, similar_users
 
 app = FastAPI(title="Reel Hot Takes API")
 
@@ -30,31 +42,122 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request stage breakdowns: always for ?timing=1 / X-Debug-Timing, or when SERVER_TIMING=1;
+# requests slower than SLOW_REQUEST_MS are also logged as one JSON line
+SERVER_TIMING = os.getenv("SERVER_TIMING") == "1"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+
+@app.middleware("http")
+async def stage_timing(request: Request, call_next):
+    timings = start_request_timings()
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - t0
+    if SERVER_TIMING or request.headers.get("x-debug-timing") or request.query_params.get("timing") == "1":
+        response.headers["Server-Timing"] = server_timing_header(timings, total)
+    if SLOW_REQUEST_MS and total * 1000 >= SLOW_REQUEST_MS:
+        print(json.dumps({
+            "event": "slow_request",
+            "path": request.url.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 1),
+            "stages": [{"stage": st, "count": n, "wall_ms": round(wall * 1000, 1)}
+                       for st, (n, wall) in summarize_timings(timings).items()],
+        }))
+    return response
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    app.state.loop_lag_task = asyncio.create_task(monitor_loop_lag())
+
+@app.on_event("startup")
+async def create_leaderboard_indexes():
+    # Don't let an unreachable Mongo block startup; reads still work without the indexes
+    try:
+        await ensure_indexes()
+    except Exception as e:
+        print(f"[HotTakes] index creation failed: {e}")
+
 @app.get("/")
 def root():
     return {"message": "Welcome to the Reel Hot Takes API"}
 
 @app.get("/users/{username}/ratings")
 async def get_user_ratings(username, force_sync = False):
-    movies = await get_user_ratings_or_sync(username, force=force_sync)
-    if not movies:
+    movies, complete = await get_user_ratings_or_sync(username, force=force_sync)
+    if not movies and complete:
         return {"error": f"Username '{username}' not found or has no rated movies."}
 
-    hotness_sorted = calculate_hotness(movies)
-    return {"username": username, "movies": hotness_sorted}
+    with timed("hotness"):
+        hotness_sorted = calculate_hotness(movies)
+    return {"username": username, "complete": complete, "movies": hotness_sorted}
 
 
 @app.get("/users/{username}/recommendations")
-async def get_recs(username, k= 20, min_votes = 0):
-    await load_catalog(collection)
-    doc = await user_ratings_collection.find_one(
-        {"lb_username": username}, {"_id": 0, "ratings": 1}
-    )
+async def get_recs(username, k: int = Query(20, ge=1, le=RANK_DEPTH), min_votes: int = 0,
+                   cursor: Optional[str] = None):
+    # Blocks only on first use; later rebuilds (age / appended films) run in the background
+    await ensure_catalog(collection)
+    if cursor:
+        # Later pages slice the ranked list held for the cursor; no rescoring
+        try:
+            with timed("recommend.page"):
+                recs, next_cursor, min_votes = next_page(username, cursor, k)
+        except ValueError as e:
+            return {"error": str(e)}
+        return {"username": username, "k": k, "min_votes": min_votes, "count": len(recs),
+                "recommendations": recs, "next_cursor": next_cursor}
+    with timed("recommend.ratings_lookup"):
+        doc = await user_ratings_collection.find_one(
+            {"lb_username": username}, {"_id": 0, "ratings": 1}
+        )
     if not doc or not doc.get("ratings"):
         return {"error": f"No stored ratings for '{username}'"}
-    recs = recommend_from_ratings(doc["ratings"], k=k, min_votes=min_votes)
-    return {"username": username, "k": k, "min_votes": min_votes, "count": len(recs), "recommendations": recs}
+    with timed("recommend.score"):
+        recs, next_cursor = first_page(username, doc["ratings"], k=k, min_votes=min_votes)
+    return {"username": username, "k": k, "min_votes": min_votes, "count": len(recs),
+            "recommendations": recs, "next_cursor": next_cursor}
+
+@app.get("/users/{username}/similar")
+async def get_similar_users(username, k: int = 10):
+    await ensure_catalog(collection)
+    # Rebuilds run in the background; the previous index serves until the new one is ready
+    if not ensure_user_index(user_ratings_collection):
+        return {"error": "Similarity index is building; try again shortly.", "building": True}
+    users = similar_users(username, k)
+    if users is None:
+        return {"error": f"No taste profile for '{username}'; sync their ratings first."}
+    return {"username": username, "k": k, "count": len(users), "similar_users": users}
+
+@app.get("/leaderboard/hot-takes")
+async def get_hot_takes(limit: int = 20):
+    takes = await top_hot_takes(limit)
+    return {"count": len(takes), "hot_takes": takes}
+
+# :path so titles containing "/" (Face/Off, 50/50) still route
+@app.get("/films/{title:path}/hot-takes")
+async def get_film_hot_takes(title, year: Optional[int] = None, limit: int = 20):
+    takes = await film_hot_takes(title, year, limit)
+    if not takes:
+        return {"error": f"No hot takes stored for '{title}'"}
+    return {"title": title, "year": year, "count": len(takes), "hot_takes": takes}
 
 @app.get("/test-catalog")
 async def test_catalog():
-    await load_catalog(collection)
\ No newline at end of file
+    await load_catalog(collection)
+
+@app.get("/catalog/stats")
+async def get_catalog_stats():
+    await ensure_catalog(collection)
+    return catalog_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # On the event loop, not the threadpool: rendering iterates dicts the loop inserts into
+    stats = catalog_stats()
+    if stats.get("loaded"):
+        set_gauge("catalog_rows", stats["rows"])
+        set_gauge("catalog_delta_rows", stats["delta_rows"])
+        set_gauge("catalog_matrix_bytes", stats["matrix_bytes"])
+        set_gauge("catalog_build_seconds", stats["build_seconds"])
+    return render_prometheus()
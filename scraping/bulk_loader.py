@@ -2,8 +2,9 @@ import asyncio
 import aiohttp
 import csv
 from core.db import collection
+from scraping.scraper import IMDB_API_URL
 
-API_URL = "https://api.imdbapi.dev/titles/{}"
+API_URL = IMDB_API_URL + "/titles/{}"
 
 errorCount = 0
 erroredMovies = set()
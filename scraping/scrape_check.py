@@ -1,7 +1,7 @@
 import zlib
 import aiohttp
 from bs4 import BeautifulSoup
-from scraping.scraper import fetch
+from scraping.scraper import fetch, LETTERBOXD_URL
 
 def _signature_from_pairs(pairs: list[tuple[str, int]]) -> str:
     raw = "|".join(f"{t}::{r}" for t, r in pairs)
@@ -9,7 +9,7 @@ def _signature_from_pairs(pairs: list[tuple[str, int]]) -> str:
 
 async def light_check(username: str) -> tuple[str, int]:
     """Scrape only page 1; return (first_page_sig, count_on_page1)."""
-    url = f"https://letterboxd.com/{username}/films/page/1/"
+    url = f"{LETTERBOXD_URL}/{username}/films/page/1/"
     async with aiohttp.ClientSession() as session:
         html = await fetch(session, url)
     soup = BeautifulSoup(html, "lxml")
@@ -2,24 +2,64 @@ import asyncio
 import aiohttp
 from bs4 import BeautifulSoup
 from core.db import collection, user_ratings_collection
+from core.metrics import timed, record_outbound, record_cache
+from services.recommender import append_to_catalog
 import os
 from datetime import datetime, timezone
 
-BASE_URL = "https://letterboxd.com/{}/films/page/{}/"
+# Overridable so load tests can point the scraper at a local stand-in
+LETTERBOXD_URL = os.getenv("LETTERBOXD_BASE_URL", "https://letterboxd.com").rstrip("/")
+IMDB_API_URL = os.getenv("IMDB_API_BASE_URL", "https://api.imdbapi.dev").rstrip("/")
+BASE_URL = LETTERBOXD_URL + "/{}/films/page/{}/"
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 sem = asyncio.Semaphore(10)
 
+# Per-call timeout for every outbound request, and the overall budget for one user scrape
+FETCH_TIMEOUT = aiohttp.ClientTimeout(total=float(os.getenv("FETCH_TIMEOUT_S", "10")), sock_connect=5)
+SCRAPE_BUDGET_S = float(os.getenv("SCRAPE_BUDGET_S", "25"))
+
+
+def scrape_deadline(budget=None):
+    """Absolute event-loop deadline `budget` seconds (default SCRAPE_BUDGET_S) from now."""
+    return asyncio.get_running_loop().time() + (SCRAPE_BUDGET_S if budget is None else budget)
+
+
+def _remaining(deadline):
+    if deadline is None:
+        return None
+    return max(deadline - asyncio.get_running_loop().time(), 0.0)
+
+
+async def _wait_until(tasks, deadline):
+    """Wait for tasks until the deadline; cancel and reap whatever is still running."""
+    if not tasks:
+        return set(), set()
+    done, pending = await asyncio.wait(tasks, timeout=_remaining(deadline))
+    for t in pending:
+        t.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+    return done, pending
+
 
 async def fetch(session, url):
     async with sem:
-        async with session.get(url) as resp:
-            return await resp.text()
+        try:
+            async with session.get(url) as resp:
+                text = await resp.text()
+        except Exception:
+            record_outbound(url)
+            raise
+        # Counted only once the body arrived, so a failed read is an error, not a status
+        record_outbound(url, resp.status)
+        return text
 
 
 async def get_page_count(username):
-    url = f"https://letterboxd.com/{username}/films/"
-    async with aiohttp.ClientSession() as session:
-        html = await fetch(session, url)
+    url = f"{LETTERBOXD_URL}/{username}/films/"
+    async with aiohttp.ClientSession(timeout=FETCH_TIMEOUT) as session:
+        with timed("scrape.page_count"):
+            html = await fetch(session, url)
         soup = BeautifulSoup(html, "lxml")
         # Check for invalid username
         not_found = soup.find("body", class_="error")
@@ -36,13 +76,21 @@ async def get_page_count(username):
             return 0
 
 """
-Get the Letterboxd film pages for a given user
+Get the given Letterboxd film pages (page numbers) for a user.
+Returns (movies_dict, missing): page numbers that failed or missed the deadline.
 """
-async def fetch_letterboxd_pages(username, total_pages):
+async def fetch_letterboxd_pages(username, page_numbers, deadline=None):
     movies_dict = {}
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch(session, BASE_URL.format(username, p)) for p in range(1, total_pages + 1)]
-        pages = await asyncio.gather(*tasks)
+    page_numbers = list(page_numbers)
+    async with aiohttp.ClientSession(timeout=FETCH_TIMEOUT) as session:
+        tasks = [asyncio.ensure_future(fetch(session, BASE_URL.format(username, p))) for p in page_numbers]
+        with timed("scrape.pages"):
+            done, pending = await _wait_until(tasks, deadline)
+        ok = [t in done and t.exception() is None for t in tasks]
+        pages = [t.result() for t, good in zip(tasks, ok) if good]
+        missing = [p for p, good in zip(page_numbers, ok) if not good]
+        if missing:
+            print(f"[Warning] {len(missing)}/{len(tasks)} film pages missing for user '{username}': {missing}")
 
         for html in pages:
             soup = BeautifulSoup(html, "lxml")
@@ -74,7 +122,7 @@ async def fetch_letterboxd_pages(username, total_pages):
                         print("[Warning] Skipping due to missing parent div")
                         continue
 
-                    movie_link = "https://letterboxd.com" + parent_div["data-item-link"]
+                    movie_link = LETTERBOXD_URL + parent_div["data-item-link"]
 
                     if title in movies_dict:
                         continue
@@ -90,7 +138,7 @@ async def fetch_letterboxd_pages(username, total_pages):
                     print(f"[Warning] Skipping a movie due to parse error: {e} at {title if 'title' in locals() else 'unknown'}")
                     continue
 
-    return movies_dict
+    return movies_dict, missing
 
 async def fetch_imdb_data(session, movie_title, imdb_url):
     async with session.get(imdb_url) as resp:
@@ -115,7 +163,9 @@ async def fetch_letterboxd_data(session, movie_title, letterboxd_url):
     Get a films data (title, year, etc) via database, if not in database then add to it
     """
     # check if in mongo database
-    existing = await collection.find_one({"title": movie_title})
+    with timed("scrape.film_lookup"):
+        existing = await collection.find_one({"title": movie_title})
+    record_cache("film_db", existing is not None)
     if existing:
         return {
             "imdb_id": existing.get("imdb_id", ""),
@@ -139,19 +189,28 @@ async def fetch_letterboxd_data(session, movie_title, letterboxd_url):
     # Get from IMDB API if not in database
     else:
         try:
-            html = await fetch(session, letterboxd_url)
+            with timed("scrape.film_page"):
+                html = await fetch(session, letterboxd_url)
             soup = BeautifulSoup(html, "lxml")
             imdb_tag = soup.find("p", class_="text-link text-footer")
             imdb_link = imdb_tag.find("a", attrs={"data-track-action": "IMDb"})["href"]
             imdb_id = imdb_link.rstrip('/').split('/')[-2]
 
-            imdb_api_url = f"https://api.imdbapi.dev/titles/{imdb_id}"
-            async with session.get(imdb_api_url) as resp:
-                if resp.status == 200:
-                    data = await resp.json(content_type=None)
-                else:
-                    text = await resp.text()
-                    print(f"IMDB API error: status={resp.status}, body={text}")
+            imdb_api_url = f"{IMDB_API_URL}/titles/{imdb_id}"
+            with timed("scrape.imdb_api"):
+                try:
+                    async with session.get(imdb_api_url) as resp:
+                        status = resp.status
+                        if status == 200:
+                            data = await resp.json(content_type=None)
+                        else:
+                            text = await resp.text()
+                except Exception:  # timeouts included
+                    record_outbound(imdb_api_url)
+                    raise
+                record_outbound(imdb_api_url, status)
+                if status != 200:
+                    print(f"IMDB API error: status={status}, body={text}")
                     return {}
 
             # print(f"title: {movie_title}\nyear: {year}\ndirector: {director}\noverview: {overview}\naverage: {average}\nvotes: {votes}\nposter: {poster}\ngenres: {genres}\n")
@@ -180,6 +239,8 @@ async def fetch_letterboxd_data(session, movie_title, letterboxd_url):
                 {"$set": {**movie_data, "title": movie_title}},
                 upsert=True
             )
+            # Make the new film recommendable without waiting for a full catalog rebuild
+            append_to_catalog([{**movie_data, "title": movie_title}])
 
             await asyncio.sleep(0.15)
 
@@ -189,12 +250,23 @@ async def fetch_letterboxd_data(session, movie_title, letterboxd_url):
             print(f"[Warning] Letterboxd scrape failed for {movie_title}: {e}")
             return {}
 
-async def update_movies_with_letterboxd(movies, movies_dict):
-    async with aiohttp.ClientSession() as session:
-        tasks = [fetch_letterboxd_data(session, m['title'], m['link']) for m in movies]
-        results = await asyncio.gather(*tasks)
-
-        for movie, lb_data in zip(movies, results):
+async def update_movies_with_letterboxd(movies, movies_dict, deadline=None):
+    """
+    Resolve film metadata for each scraped movie.
+    Returns (resolved, pending): films still running at the deadline are cancelled
+    and handed back untouched in `pending` so they can be resumed later.
+    """
+    async with aiohttp.ClientSession(timeout=FETCH_TIMEOUT) as session:
+        tasks = [asyncio.ensure_future(fetch_letterboxd_data(session, m['title'], m['link'])) for m in movies]
+        with timed("scrape.films"):
+            _, unfinished = await _wait_until(tasks, deadline)
+
+        resolved, pending = [], []
+        for movie, task in zip(movies, tasks):
+            if task in unfinished:
+                pending.append(movie)
+                continue
+            lb_data = task.result()
             movie["imdb_id"] = lb_data.get("imdb_id", "")
             movie["type"] = lb_data.get("type", "")
             movie["title"] = lb_data.get("title", "")
@@ -212,10 +284,11 @@ async def update_movies_with_letterboxd(movies, movies_dict):
             movie["spokenLanguages"] = lb_data.get("spokenLanguages", [])
             movie["interests"] = lb_data.get("interests", [])
             movie["overview"] = lb_data.get("overview", "")
+            resolved.append(movie)
 
-    return movies
+    return resolved, pending
 
-async def _upsert_user_ratings(username: str, movies: list[dict]) -> None:
+async def _upsert_user_ratings(username: str, movies: list[dict], complete: bool = True) -> None:
     """
     Store the user's ratings in Mongo (UserRatings collection).
     Keeps only the minimal fields the recommender needs + useful metadata.
@@ -239,19 +312,37 @@ async def _upsert_user_ratings(username: str, movies: list[dict]) -> None:
     now = datetime.now(timezone.utc).isoformat()
     await user_ratings_collection.update_one(
         {"lb_username": username},
-        {"$set": {"ratings": ratings, "updated_at": now, "source": "letterboxd"}},
+        {"$set": {"ratings": ratings, "updated_at": now, "source": "letterboxd", "complete": complete}},
         upsert=True
     )
 
-async def scrape_user(username):
-    total_pages = await get_page_count(username)
+async def scrape_user(username, deadline=None):
+    """
+    Scrape a user's rated films, stopping at `deadline` (event-loop time) if given.
+    Returns (movies, pending, missing_pages): resolved films, films whose metadata
+    lookup was cut off, and grid page numbers not fetched (see resume_films /
+    fetch_letterboxd_pages); missing_pages is None if even the page count failed.
+    """
+    try:
+        total_pages = await asyncio.wait_for(get_page_count(username), timeout=_remaining(deadline))
+    except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+        print(f"[Error] Could not fetch page count for {username}: {e!r}")
+        return [], [], None
     if total_pages == 0:
         print(f"[Error] Invalid or non-existent Letterboxd username: {username}")
-        return []
-    movies_dict = await fetch_letterboxd_pages(username, total_pages)
+        return [], [], []
+    movies_dict, missing_pages = await fetch_letterboxd_pages(username, range(1, total_pages + 1), deadline)
     movies = list(movies_dict.values())
-    movies = await update_movies_with_letterboxd(movies, movies_dict)
+    movies, pending = await update_movies_with_letterboxd(movies, movies_dict, deadline)
+    if pending:
+        print(f"[Deadline] user={username}: {len(pending)} films unresolved; returning partial ratings")
+
+    with timed("scrape.upsert"):
+        await _upsert_user_ratings(username, movies, not missing_pages and not pending)
 
-    await _upsert_user_ratings(username, movies)
+    return movies, pending, missing_pages
 
-    return movies
+async def resume_films(pending):
+    """Finish metadata lookups a deadline cut off; no deadline, only per-request timeouts."""
+    resolved, _ = await update_movies_with_letterboxd(pending, {})
+    return resolved
@@ -0,0 +1,143 @@
+"""
+Materialized "hottest takes" leaderboard across all users.
+
+HotTakes holds one doc per (user, rated film) with its precomputed hotness,
+refreshed whenever a user's ratings are upserted. Global and per-film
+leaderboards are index-backed top-K reads, so they don't grow with users.
+
+Backfill / repair:
+    python -m services.leaderboard --rebuild
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+
+from core.db import hot_takes_collection, user_ratings_collection
+from core.metrics import timed
+from services.recommender import film_key, norm_title
+from services.scoring import calculate_hotness
+
+MAX_LIMIT = 100
+_projection = {"_id": 0, "film_key": 0, "title_key": 0}
+
+
+async def ensure_indexes():
+    await hot_takes_collection.create_index([("hotness", DESCENDING)])
+    await hot_takes_collection.create_index([("film_key", ASCENDING), ("hotness", DESCENDING)])
+    await hot_takes_collection.create_index([("title_key", ASCENDING), ("hotness", DESCENDING)])
+    # One doc per (user, film): concurrent writers upsert the same docs instead of duplicating them
+    await hot_takes_collection.create_index([("lb_username", ASCENDING), ("film_key", ASCENDING)], unique=True)
+
+
+def _is_number(x):
+    return isinstance(x, (int, float)) and not isinstance(x, bool)
+
+
+def _hot_take_docs(username, ratings) -> List[Dict[str, Any]]:
+    # calculate_hotness needs numeric averages/votes; films without an IMDb rating can't be scored
+    scorable = [
+        {**r, "votes": r.get("votes") if _is_number(r.get("votes")) else 0}
+        for r in ratings
+        if r.get("title") and _is_number(r.get("average")) and r.get("user_rating")
+    ]
+    now = datetime.now(timezone.utc).isoformat()
+    docs = [
+        {
+            "lb_username": username,
+            "film_key": film_key(m["title"], m.get("year")),
+            "title_key": norm_title(m["title"]),
+            "title": m["title"],
+            "year": m.get("year"),
+            "imdb_id": m.get("imdb_id"),
+            "poster": m.get("poster"),
+            "user_rating": m["user_rating"],
+            "average": m["average"],
+            "votes": m["votes"],
+            "hotness": m["hotness"],
+            "updated_at": now,
+        }
+        for m in calculate_hotness(scorable)
+        if m["hotness"] > 0
+    ]
+    # calculate_hotness sorts hottest first; keep that one if a film is rated twice
+    unique: Dict[str, Dict[str, Any]] = {}
+    for d in docs:
+        unique.setdefault(d["film_key"], d)
+    return list(unique.values())
+
+
+async def update_user_hot_takes(username, ratings):
+    """
+    Sync a user's entries in HotTakes after their ratings are upserted: upsert each
+    (user, film) take, then drop the user's films that are no longer hot. Readers never
+    see the user vanish mid-update and interleaved writers can't duplicate takes.
+    """
+    docs = _hot_take_docs(username, ratings)
+    with timed("leaderboard.update"):
+        if docs:
+            await hot_takes_collection.bulk_write([
+                UpdateOne({"lb_username": username, "film_key": d["film_key"]}, {"$set": d}, upsert=True)
+                for d in docs
+            ], ordered=False)
+        await hot_takes_collection.delete_many(
+            {"lb_username": username, "film_key": {"$nin": [d["film_key"] for d in docs]}}
+        )
+    return len(docs)
+
+
+async def top_hot_takes(limit=20):
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    cursor = hot_takes_collection.find({}, _projection).sort("hotness", DESCENDING).limit(limit)
+    return await cursor.to_list(length=limit)
+
+
+async def film_hot_takes(title, year=None, limit=20):
+    """Hottest takes on one film; without a year every film sharing the title is included."""
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    query = {"film_key": film_key(title, year)} if year else {"title_key": norm_title(title)}
+    cursor = (
+        hot_takes_collection.find(query, _projection)
+        .sort("hotness", DESCENDING)
+        .limit(limit)
+    )
+    return await cursor.to_list(length=limit)
+
+
+async def rebuild_hot_takes():
+    """
+    Recompute HotTakes from every stored UserRatings doc. Each user is upserted in
+    place, so the live leaderboard stays populated throughout; takes of users no
+    longer in UserRatings are dropped at the end.
+    """
+    await ensure_indexes()
+    seen = set()
+    takes = 0
+    async for doc in user_ratings_collection.find({}, {"_id": 0, "lb_username": 1, "ratings": 1}):
+        if not doc.get("lb_username"):
+            continue
+        takes += await update_user_hot_takes(doc["lb_username"], doc.get("ratings") or [])
+        seen.add(doc["lb_username"])
+
+    # Re-check candidates against UserRatings so users synced mid-rebuild aren't dropped
+    candidates = [u for u in await hot_takes_collection.distinct("lb_username") if u not in seen]
+    orphans = []
+    if candidates:
+        still_there = set(await user_ratings_collection.distinct("lb_username", {"lb_username": {"$in": candidates}}))
+        orphans = [u for u in candidates if u not in still_there]
+        if orphans:
+            await hot_takes_collection.delete_many({"lb_username": {"$in": orphans}})
+    print(f"[HotTakes rebuild] users={len(seen)} takes={takes} orphaned_users_removed={len(orphans)}")
+    return len(seen), takes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the HotTakes leaderboard collection")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every user's hot takes")
+    args = parser.parse_args()
+    if args.rebuild:
+        asyncio.run(rebuild_hot_takes())
+    else:
+        parser.print_help()
@@ -1,11 +1,36 @@
+import os
 import zlib
+import asyncio
 import aiohttp
 from bs4 import BeautifulSoup
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any
 
 from core.db import user_ratings_collection
-from scraping.scraper import scrape_user, fetch
+from core.metrics import timed, record_cache
+from services.leaderboard import update_user_hot_takes
+from services.user_similarity import update_user_profile
+from services.recommender import current_catalog, profile_terms
+from scraping.scraper import (
+    scrape_user, resume_films, fetch_letterboxd_pages, scrape_deadline, _remaining, fetch,
+    LETTERBOXD_URL, FETCH_TIMEOUT,
+)
+
+# A partial UserRatings doc carries resume_lease_until while some worker finishes it in the
+# background; until then other workers (and requests) serve the partial doc instead of re-scraping
+RESUME_LEASE_S = float(os.getenv("RESUME_LEASE_S", "300"))
+
+# This worker's background tasks finishing deadline-cut scrapes, by username
+_resuming: Dict[str, asyncio.Task] = {}
+
+def _lease_active(doc):
+    lease = doc.get("resume_lease_until")
+    if not lease:
+        return False
+    try:
+        return datetime.fromisoformat(lease) > datetime.now(timezone.utc)
+    except (TypeError, ValueError):
+        return False
 
 def _signature_from_pairs(pairs):
     raw = "|".join(f"{t}::{r}" for t, r in pairs)
@@ -13,9 +38,10 @@ def _signature_from_pairs(pairs):
 
 async def _light_check(username):
     """Return a small fingerprint of page 1 (title+rating pairs)."""
-    url = f"https://letterboxd.com/{username}/films/page/1/"
-    async with aiohttp.ClientSession() as session:
-        html = await fetch(session, url)
+    url = f"{LETTERBOXD_URL}/{username}/films/page/1/"
+    async with aiohttp.ClientSession(timeout=FETCH_TIMEOUT) as session:
+        with timed("sync.light_check"):
+            html = await fetch(session, url)
     soup = BeautifulSoup(html, "lxml")
     grid = soup.find(class_="grid")
     pairs = []
@@ -36,7 +62,14 @@ async def _light_check(username):
             pairs.append((title, user_rating))
     return _signature_from_pairs(pairs)
 
-async def _upsert_user_ratings(username, movies, first_page_sig):
+async def _upsert_user_ratings(username, movies, first_page_sig, complete=True, expect_updated_at=None,
+                               resume_lease_until=None):
+    """
+    Store ratings and refresh HotTakes/similarity; returns the updated_at written.
+    With expect_updated_at, only overwrite if the doc hasn't been rewritten since
+    (returns None and touches nothing otherwise). resume_lease_until marks a partial
+    doc as being resumed; every other write clears it.
+    """
     ratings = []
     for m in movies:
         if not m.get("title"):
@@ -52,32 +85,109 @@ async def _upsert_user_ratings(username, movies, first_page_sig):
             "average": m.get("average"),
             "votes": m.get("votes"),
         })
+    # Title -> catalog mapping (possibly fuzzy) happens once here, off the event loop;
+    # the similarity index rebuilds from these stored terms by exact lookup. The executor
+    # gets the catalog snapshot, never the live one a rebuild may replace.
+    terms = None
+    catalog = current_catalog()
+    if catalog is not None:  # not loaded in this worker yet: the next index rebuild maps them
+        try:
+            terms = await asyncio.get_running_loop().run_in_executor(None, profile_terms, ratings, catalog)
+        except Exception as e:  # never lose the ratings over the derived terms
+            print(f"[Similarity] profile_terms failed for user={username}: {e!r}")
     now = datetime.now(timezone.utc).isoformat()
-    result = await user_ratings_collection.update_one( 
-        {"lb_username": username},
+    query = {"lb_username": username}
+    if expect_updated_at is not None:
+        query["updated_at"] = expect_updated_at
+    result = await user_ratings_collection.update_one(
+        query,
         {"$set": {
             "ratings": ratings,
             "updated_at": now,
             "first_page_sig": first_page_sig,
             "ratings_count": len(ratings),
+            "complete": complete,
+            "resume_lease_until": resume_lease_until,
+            "profile_terms": terms,
             "source": "letterboxd",
         }},
-        upsert=True
+        upsert=expect_updated_at is None
     )
-   
+    if expect_updated_at is not None and result.matched_count == 0:
+        print(f"[UserRatings upsert] user={username} changed since {expect_updated_at}; skipping stale write")
+        return None
+
     print(f"[UserRatings upsert] user={username} matched={result.matched_count} "
           f"modified={result.modified_count} upserted_id={result.upserted_id} "
-          f"ratings_count={len(ratings)} sig={first_page_sig}")
+          f"ratings_count={len(ratings)} sig={first_page_sig} complete={complete}")
+
+    try:
+        await update_user_hot_takes(username, ratings)
+    except Exception as e:
+        print(f"[HotTakes] update failed for user={username}: {e}")
+    try:
+        if terms is not None:
+            update_user_profile(username, terms)
+    except Exception as e:
+        print(f"[Similarity] profile update failed for user={username}: {e}")
+    return now
+
+async def _resume_sync(username, movies, pending, missing_pages, first_page_sig, written_at):
+    """
+    Re-fetch the grid pages and resolve the films a deadline cut off, then store the
+    full ratings, but only if the partial doc written at `written_at` is still the
+    latest (no newer sync won). Pages that fail again leave the doc incomplete with no
+    lease, so the next request re-scrapes.
+    """
+    try:
+        with timed("sync.resume"):
+            extra = []
+            if missing_pages:
+                found, missing_pages = await fetch_letterboxd_pages(username, missing_pages)
+                known = {m.get("link") for m in movies} | {m.get("link") for m in pending}
+                extra = [m for m in found.values() if m.get("link") not in known]
+            resolved = await resume_films(pending + extra)
+            if first_page_sig is None:
+                try:
+                    first_page_sig = await _light_check(username)
+                except Exception:
+                    pass
+            await _upsert_user_ratings(username, movies + resolved, first_page_sig,
+                                       complete=not missing_pages, expect_updated_at=written_at)
+    except Exception as e:
+        print(f"[Resume] failed for user={username}: {e}")
+        # Drop our lease so the next request (on any worker) re-scrapes instead of waiting it out
+        try:
+            await user_ratings_collection.update_one(
+                {"lb_username": username, "updated_at": written_at}, {"$set": {"resume_lease_until": None}}
+            )
+        except Exception:
+            pass
+    finally:
+        if _resuming.get(username) is asyncio.current_task():
+            _resuming.pop(username, None)
 
 async def get_user_ratings_or_sync(username, force = False):
-    """Return cached ratings unless stale; scrape abd update if stale or forced."""
-    cached = await user_ratings_collection.find_one({"lb_username": username})
-    if cached and not force:
+    """
+    Return (ratings, complete): cached ratings unless stale; scrape and update if stale or forced.
+    Scrapes stop at SCRAPE_BUDGET_S; films and pages left over are finished in the background
+    (under a lease on the doc, see RESUME_LEASE_S) and complete is False until they land.
+    """
+    deadline = scrape_deadline()
+    with timed("sync.cache_lookup"):
+        cached = await user_ratings_collection.find_one({"lb_username": username})
+    if cached and not cached.get("complete", True):
+        if not force and (username in _resuming or _lease_active(cached)):
+            record_cache("user_ratings", True)
+            return cached.get("ratings", []), False
+        print(f"[Light check] cached ratings for user={username} are partial; refreshing…")
+    elif cached and not force:
         try:
             sig_now = await _light_check(username)
             if sig_now and sig_now == cached.get("first_page_sig"):
                 print("[Light check] no change detected; using cache")
-                return cached.get("ratings", [])
+                record_cache("user_ratings", True)
+                return cached.get("ratings", []), True
             # ADD: only print when we actually plan to update
             if sig_now and sig_now != cached.get("first_page_sig"):
                 print(f"[Light check] change detected for user={username}: "
@@ -87,10 +197,33 @@ async def get_user_ratings_or_sync(username, force = False):
         except Exception as e:
             print(f"[Light check] failed for user={username}: {e}; refreshing…")
 
-    movies = await scrape_user(username)
-    if not movies:
+    record_cache("user_ratings", False)
+    # A fresh scrape supersedes any resume still finishing an older one
+    stale = _resuming.pop(username, None)
+    if stale is not None:
+        stale.cancel()
+    with timed("sync.scrape"):
+        movies, pending, missing_pages = await scrape_user(username, deadline)
+    if not movies and not pending:
         print(f"[Scrape] no movies for user={username}; returning cached if present")
-        return cached.get("ratings", []) if cached else []
-    sig_now = await _light_check(username)
-    await _upsert_user_ratings(username, movies, sig_now)
-    return movies
+        if cached:
+            return cached.get("ratings", []), cached.get("complete", True)
+        return [], missing_pages == []
+    # The signature check stays inside the scrape deadline; past it, store without one
+    sig_now = None
+    remaining = _remaining(deadline)
+    if remaining > 0:
+        try:
+            sig_now = await asyncio.wait_for(_light_check(username), timeout=remaining)
+        except Exception as e:
+            print(f"[Light check] failed for user={username}: {e!r}; storing without signature")
+    complete = not missing_pages and not pending
+    lease = None if complete else (datetime.now(timezone.utc) + timedelta(seconds=RESUME_LEASE_S)).isoformat()
+    with timed("sync.upsert"):
+        written_at = await _upsert_user_ratings(username, movies, sig_now, complete=complete,
+                                                resume_lease_until=lease)
+    if not complete:
+        _resuming[username] = asyncio.create_task(
+            _resume_sync(username, movies, pending, missing_pages, sig_now, written_at)
+        )
+    return movies, complete
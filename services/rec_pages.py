@@ -0,0 +1,91 @@
+"""
+Cursor pagination for recommendations.
+
+The first page ranks REC_RANK_DEPTH rows once and keeps just their indices and
+scores (int32 + float32, ~4 KB per list) in memory for REC_CURSOR_TTL_S. Later
+pages slice that list and hydrate only the rows on the page; each read renews
+the list's TTL, and the least recently used list is evicted at _MAX_LISTS.
+A cursor dies with its list: on expiry, eviction, or a new catalog version.
+"""
+import base64
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from services import recommender
+
+RANK_DEPTH = int(os.getenv("REC_RANK_DEPTH", "500"))
+CURSOR_TTL_S = float(os.getenv("REC_CURSOR_TTL_S", "600"))
+_MAX_LISTS = 2048
+
+# token -> (expires_at, catalog_version, username, min_votes, idx, scores); least recently used first,
+# which is also earliest-expiring first since every touch renews the TTL
+_lists: "OrderedDict[str, Tuple]" = OrderedDict()
+
+
+def _encode(token, offset):
+    return base64.urlsafe_b64encode(f"{token}:{offset}".encode()).decode().rstrip("=")
+
+
+def _decode(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        token, offset = raw.rsplit(":", 1)
+        return token, int(offset)
+    except Exception:
+        raise ValueError("Malformed cursor")
+
+
+def _evict(now):
+    while _lists and (len(_lists) >= _MAX_LISTS or next(iter(_lists.values()))[0] < now):
+        _lists.popitem(last=False)
+
+
+def _clamp_k(k):
+    return max(1, min(int(k), RANK_DEPTH))
+
+
+def _page(token, idx, scores, offset, k) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    end = offset + k
+    recs = recommender.hydrate_rows(idx[offset:end], scores[offset:end])
+    return recs, (_encode(token, end) if end < len(idx) else None)
+
+
+def first_page(username, user_movies, k=20, min_votes=0):
+    """Rank once, hold the list, and return (first k recommendations, next cursor or None)."""
+    k = _clamp_k(k)
+    idx, scores = recommender.rank_from_ratings(user_movies, depth=RANK_DEPTH, min_votes=min_votes)
+    if len(idx) <= k:
+        return recommender.hydrate_rows(idx, scores), None
+    now = time.monotonic()
+    _evict(now)
+    token = secrets.token_urlsafe(9)
+    _lists[token] = (now + CURSOR_TTL_S, recommender.catalog_version(), username, min_votes, idx, scores)
+    return _page(token, idx, scores, 0, k)
+
+
+def next_page(username, cursor, k=20):
+    """
+    Serve the page a cursor points at. Returns (recs, next cursor or None, min_votes).
+    Raises ValueError if the cursor is malformed, expired, for another user, or
+    from an older catalog version.
+    """
+    k = _clamp_k(k)
+    token, offset = _decode(cursor)
+    now = time.monotonic()
+    entry = _lists.get(token)
+    if entry is None or entry[0] < now:
+        _lists.pop(token, None)
+        raise ValueError("Cursor expired; request the first page again")
+    _, version, owner, min_votes, idx, scores = entry
+    if version != recommender.catalog_version():
+        _lists.pop(token, None)
+        raise ValueError("Catalog changed since this cursor was issued; request the first page again")
+    if owner != username or offset < 0:
+        raise ValueError("Cursor does not belong to this request")
+    _lists[token] = (now + CURSOR_TTL_S, *entry[1:])
+    _lists.move_to_end(token)
+    recs, next_cursor = _page(token, idx, scores, offset, k)
+    return recs, next_cursor, min_votes
@@ -1,23 +1,95 @@
 # recommender_mongo.py
 from __future__ import annotations
+import asyncio
+import dataclasses
+import hashlib
+import os
 import re
+import time
 import difflib
-from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+from itertools import chain
+from typing import Dict, Any, List, Optional, Tuple
 
 import numpy as np
 from motor.motor_asyncio import AsyncIOMotorCollection
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.preprocessing import StandardScaler
-from scipy.sparse import hstack, csr_matrix
+from scipy.sparse import hstack, vstack, csr_matrix
+
+from core.metrics import timed
+
+# ----------------- Feature budget (env overrides) -----------------
+def _env_df(name: str, default):
+    # min_df/max_df follow sklearn: ints are document counts, floats are proportions
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    return float(raw) if "." in raw else int(raw)
+
+CATALOG_VECTORIZER = os.getenv("CATALOG_VECTORIZER", "tfidf")          # "tfidf" | "hashing"
+CATALOG_MIN_DF = _env_df("CATALOG_MIN_DF", 1)
+CATALOG_MAX_DF = _env_df("CATALOG_MAX_DF", 1.0)
+CATALOG_MAX_FEATURES = int(os.getenv("CATALOG_MAX_FEATURES", "0")) or None
+CATALOG_HASH_FEATURES = int(os.getenv("CATALOG_HASH_FEATURES", str(2 ** 18)))
+CATALOG_NUM_TOKENS = os.getenv("CATALOG_NUM_TOKENS", "1") == "1"       # avg/votes/year as text tokens
+# Rebuild at least this often so writes from other workers / bulk_loader / vote updates show up
+CATALOG_MAX_AGE_S = float(os.getenv("CATALOG_MAX_AGE_S", "900"))
 
 # ----------------- In-memory catalog -----------------
-_catalog_loaded = False
-_rows: List[Dict[str, Any]] = []              # catalog rows in order
-_title2idx: Dict[str, int] = {}               # title -> row index
-_titleyear2idx: Dict[str, int] = {}           # normalized "title::year" -> row index
-
-_vectorizer: Optional[TfidfVectorizer] = None
-_features = None                               # sparse (N, D_text + D_num)
+@dataclass(frozen=True)
+class Catalog:
+    """
+    One immutable catalog build plus its appended delta segment.
+    Nothing mutates a published Catalog: rebuilds and appends publish a new one with a
+    single assignment to _catalog, so code holding a reference (e.g. in an executor
+    thread) always sees rows, title indices and features from the same build.
+    """
+    version: int                               # bumped only when rows or the feature space change
+    fingerprint: str                           # hash of the fetched docs + build options
+    built_at: float                            # time.monotonic() of the last full build (or no-op refresh)
+    build_seconds: float
+    num_tokens: bool
+    vectorizer: Any                            # fitted TfidfVectorizer | HashingVectorizer
+    num_scaler: Optional[StandardScaler]
+    rows: List[Dict[str, Any]]                 # main catalog rows in order
+    title2idx: Dict[str, int]                  # title -> row index
+    titleyear2idx: Dict[str, int]              # normalized "title::year" -> row index
+    title_keys: List[str]                      # list(title2idx), the fuzzy-match candidates
+    features: Any                              # sparse (N, D_text + D_num)
+    # Rows appended since the build, scored alongside the main matrix (indices continue after N)
+    delta_rows: Tuple[Dict[str, Any], ...] = ()
+    delta_title2idx: Dict[str, int] = dataclasses.field(default_factory=dict)
+    delta_titleyear2idx: Dict[str, int] = dataclasses.field(default_factory=dict)
+    delta_features: Any = None                 # sparse (M, D)
+
+    @property
+    def n_main(self) -> int:
+        return len(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows) + len(self.delta_rows)
+
+    def row(self, i: int) -> Dict[str, Any]:
+        return self.rows[i] if i < len(self.rows) else self.delta_rows[i - len(self.rows)]
+
+    def all_rows(self):
+        return chain(self.rows, self.delta_rows)
+
+    def by_title_year(self, key: str) -> Optional[int]:
+        i = self.titleyear2idx.get(key)
+        return i if i is not None else self.delta_titleyear2idx.get(key)
+
+    def by_title(self, key: str) -> Optional[int]:
+        i = self.title2idx.get(key)
+        return i if i is not None else self.delta_title2idx.get(key)
+
+
+_catalog: Optional[Catalog] = None
+_compact_after = 2_000                         # delta rows that make a full rebuild worthwhile
+_load_lock = asyncio.Lock()                    # one full build at a time
+_refresh_task: Optional[asyncio.Task] = None
+_appends_during_load: Optional[List[dict]] = None   # append_to_catalog() docs seen while a build runs
 
 # ----------------- helpers -----------------
 _punct_re = re.compile(r"[^\w\s]")
@@ -25,7 +97,8 @@ _punct_re = re.compile(r"[^\w\s]")
 def _safe_join(parts):
     return " ".join(p.strip() for p in parts if isinstance(p, str) and p.strip())
 
-def _norm_title(t: str) -> str:
+def norm_title(t: str) -> str:
+    """Lowercased title without punctuation, with trailing ", The"/", A"/", An" moved to the front."""
     if not t:
         return ""
     t = t.lower().strip()
@@ -35,21 +108,25 @@ def _norm_title(t: str) -> str:
     t = _punct_re.sub("", t)
     return " ".join(t.split())
 
-def _mk_key(title: str, year: Any | None) -> str:
-    title_key = _norm_title(title)
+def film_key(title: str, year: Any | None) -> str:
+    """Normalized "title::year" key shared by the catalog index, profile_terms and HotTakes."""
+    title_key = norm_title(title)
     y = str(year).strip() if year is not None else ""
     return f"{title_key}::{y}" if y else title_key
 
-def _feature_text(doc: dict) -> str:
+def _feature_text(doc: dict, num_tokens: bool = True) -> str:
     # Accept both Title/title, etc.
     title    = str(doc.get("Title") or doc.get("title") or "")
     overview = str(doc.get("Overview") or doc.get("overview") or "")
     genres_v = doc.get("Genres") or doc.get("genres") or []
     genres   = " ".join(genres_v) if isinstance(genres_v, list) else str(genres_v or "")
-    avg      = str(doc.get("Average Score") or doc.get("average") or doc.get("vote_average") or "")
-    votes    = str(doc.get("Vote Count")    or doc.get("votes")   or doc.get("vote_count")    or "")
-    year     = str(doc.get("Year") or doc.get("year") or "")
-    text = _safe_join([title, genres, overview, avg, votes, year])
+    parts    = [title, genres, overview]
+    if num_tokens:
+        avg   = str(doc.get("Average Score") or doc.get("average") or doc.get("vote_average") or "")
+        votes = str(doc.get("Vote Count")    or doc.get("votes")   or doc.get("vote_count")    or "")
+        year  = str(doc.get("Year") or doc.get("year") or "")
+        parts += [avg, votes, year]
+    text = _safe_join(parts)
     return text if text else "unknown"
 
 def _get_numeric(doc: dict):
@@ -65,12 +142,129 @@ def _get_numeric(doc: dict):
     return avg, votes, year
 
 # ----------------- catalog load -----------------
-async def load_catalog(collection: AsyncIOMotorCollection, limit: int | None = None) -> None:
+def _index_rows(docs, offset: int = 0):
+    """Title indices for docs numbered from `offset`."""
+    title2idx: Dict[str, int] = {}
+    titleyear2idx: Dict[str, int] = {}
+    for i, d in enumerate(docs, start=offset):
+        title = (d.get("Title") or d.get("title") or "").strip()
+        year  = d.get("Year") or d.get("year")
+        if title:
+            title2idx[title.lower()] = i
+            title2idx.setdefault(norm_title(title), i)
+            titleyear2idx[film_key(title, year)] = i
+    return title2idx, titleyear2idx
+
+def _fingerprint(docs: List[dict], opts: Dict[str, Any]) -> str:
+    h = hashlib.blake2b(repr(sorted(opts.items())).encode(), digest_size=16)
+    for d in docs:
+        h.update(repr(d).encode())
+    return h.hexdigest()
+
+def _build_catalog(docs: List[dict], opts: Dict[str, Any], prev: Optional[Catalog], force: bool) -> Catalog:
+    """
+    CPU-bound part of load_catalog (runs in an executor; reads no module state).
+    Returns `prev` re-stamped, version unchanged, when the docs and options are identical
+    and nothing was appended since, so cursors and the similarity index stay valid.
     """
-    Load catalog from Mongo and build a hybrid feature matrix:
+    fingerprint = _fingerprint(docs, opts)
+    if prev is not None and not force and prev.fingerprint == fingerprint and not prev.delta_rows:
+        return dataclasses.replace(prev, built_at=time.monotonic())
+
+    t0 = time.perf_counter()
+    rows = list(docs)
+    title2idx, titleyear2idx = _index_rows(rows)
+
+    # --- Text features
+    corpus = [_feature_text(d, opts["num_tokens"]) for d in rows]
+    if opts["vectorizer"] == "hashing":
+        vectorizer = HashingVectorizer(
+            lowercase=True,
+            token_pattern=r"(?u)\b\w+\b",
+            ngram_range=(1, 2),
+            n_features=opts["hash_features"],
+            alternate_sign=False,         # keep weights non-negative like TF-IDF
+            norm="l2",
+            dtype=np.float32,
+        )
+        X_text = vectorizer.transform(corpus)
+    else:
+        vectorizer = TfidfVectorizer(
+            lowercase=True,
+            token_pattern=r"(?u)\b\w+\b",  # keep numbers & 1-char tokens
+            min_df=opts["min_df"],
+            max_df=opts["max_df"],
+            max_features=opts["max_features"],
+            stop_words=None,
+            ngram_range=(1, 2),           # optional: unigrams+bigrams
+            dtype=np.float32,
+        )
+        X_text = vectorizer.fit_transform(corpus)
+        # Pruned terms are only kept for introspection and can outweigh the vocabulary itself
+        if hasattr(vectorizer, "stop_words_"):
+            delattr(vectorizer, "stop_words_")
+
+    # --- Numeric features (scaled) and hstack with text
+    num = np.array([_get_numeric(d) for d in rows], dtype=np.float32)  # shape (N,3)
+    if num.size == 0:
+        num_scaler = None
+        X_num = csr_matrix((len(rows), 0), dtype=np.float32)
+    else:
+        # We’ll scale dense then convert to sparse; keep it simple & small (#cols=3)
+        num_scaler = StandardScaler().fit(num)
+        X_num = csr_matrix(num_scaler.transform(num), dtype=np.float32)
+
+    return Catalog(
+        version=(prev.version if prev is not None else 0) + 1,
+        fingerprint=fingerprint,
+        built_at=time.monotonic(),
+        build_seconds=time.perf_counter() - t0,
+        num_tokens=opts["num_tokens"],
+        vectorizer=vectorizer,
+        num_scaler=num_scaler,
+        rows=rows,
+        title2idx=title2idx,
+        titleyear2idx=titleyear2idx,
+        title_keys=list(title2idx),
+        features=hstack([X_text, X_num], format="csr", dtype=np.float32),
+    )
+
+async def load_catalog(
+    collection: AsyncIOMotorCollection,
+    limit: int | None = None,
+    *,
+    vectorizer: str | None = None,
+    min_df: int | float | None = None,
+    max_df: int | float | None = None,
+    max_features: int | None = None,
+    num_tokens: bool | None = None,
+    force: bool = False,
+    if_stale: bool = False,
+) -> None:
+    """
+    Load catalog from Mongo and build a hybrid float32 feature matrix:
       [ TF-IDF(Title + Genres + Overview + nums-as-tokens) | scaled numeric columns (avg, votes, year) ]
+    Feature budget arguments default to the CATALOG_* settings. vectorizer="hashing"
+    swaps TF-IDF for a stateless HashingVectorizer that keeps no vocabulary.
+    One build runs at a time; the fit runs in an executor and the result is published in
+    one assignment. If the fetched docs are unchanged (and force is False) the current
+    build is kept as is. if_stale skips the build when, once the lock is held,
+    catalog_needs_compaction() says another caller already rebuilt.
     """
-    global _catalog_loaded, _rows, _title2idx, _titleyear2idx, _vectorizer, _features
+    global _catalog, _appends_during_load
+
+    vectorizer = vectorizer or CATALOG_VECTORIZER
+    if vectorizer not in ("tfidf", "hashing"):
+        raise ValueError(f"Unknown catalog vectorizer '{vectorizer}'")
+    opts = {
+        "limit": limit,
+        "vectorizer": vectorizer,
+        "min_df": CATALOG_MIN_DF if min_df is None else min_df,
+        "max_df": CATALOG_MAX_DF if max_df is None else max_df,
+        "max_features": CATALOG_MAX_FEATURES if max_features is None else max_features,
+        "hash_features": CATALOG_HASH_FEATURES,
+        "num_tokens": CATALOG_NUM_TOKENS if num_tokens is None else num_tokens,
+    }
 
     projection = {
         "_id": 0,
@@ -84,52 +278,175 @@ async def load_catalog(collection: AsyncIOMotorCollection, limit: int | None = N
         "Poster": 1, "poster": 1,
     }
 
-    # Fetch
-    cursor = collection.find({"votes": {"$gt": 100_000}}, projection=projection)
-    if limit:
-        cursor = cursor.limit(limit)
-    docs = await cursor.to_list(length=None)
-    # print(docs)
-
-    if not docs:
-        raise RuntimeError("Catalog query returned 0 documents. Verify DB, collection, and projection.")
-
-    # Store rows + build title indices
-    _rows = []
-    _title2idx = {}
-    _titleyear2idx = {}
-    for i, d in enumerate(docs):
-        _rows.append(d)
-        title = (d.get("Title") or d.get("title") or "").strip()
-        year  = d.get("Year") or d.get("year")
-        if title:
-            _title2idx[title.lower()] = i
-            _title2idx.setdefault(_norm_title(title), i)
-            _titleyear2idx[_mk_key(title, year)] = i
+    async with _load_lock:
+        if if_stale and not catalog_needs_compaction():
+            return
+        _appends_during_load = []
+        try:
+            # Fetch
+            cursor = collection.find({"votes": {"$gt": 100_000}}, projection=projection)
+            if limit:
+                cursor = cursor.limit(limit)
+            docs = await cursor.to_list(length=None)
+            # print(docs)
+
+            if not docs:
+                raise RuntimeError("Catalog query returned 0 documents. Verify DB, collection, and projection.")
+
+            catalog = await asyncio.get_running_loop().run_in_executor(
+                None, _build_catalog, docs, opts, _catalog, force
+            )
+            # Films appended while we were building may have missed the fetch
+            _catalog = _with_appended(catalog, _appends_during_load)
+        finally:
+            _appends_during_load = None
+
+async def _refresh_catalog(collection) -> None:
+    try:
+        with timed("catalog.refresh"):
+            await load_catalog(collection, if_stale=True)
+    except Exception as e:
+        print(f"[Catalog] background refresh failed: {e}")
+
+async def ensure_catalog(collection: AsyncIOMotorCollection) -> None:
+    """
+    Load the catalog on first use (concurrent callers share one build). Once loaded,
+    a stale catalog (see catalog_needs_compaction) is rebuilt by a single background
+    task and the current one keeps serving until the new build is swapped in.
+    """
+    global _refresh_task
+    if _catalog is None:
+        with timed("catalog.load"):
+            await load_catalog(collection, if_stale=True)
+        return
+    if catalog_needs_compaction() and (_refresh_task is None or _refresh_task.done()):
+        _refresh_task = asyncio.create_task(_refresh_catalog(collection))
+
+def current_catalog() -> Optional[Catalog]:
+    """The published catalog; pass it to functions run in executor threads."""
+    return _catalog
+
+def _require(catalog: Optional[Catalog]) -> Catalog:
+    catalog = catalog if catalog is not None else _catalog
+    if catalog is None:
+        raise RuntimeError("Catalog not loaded; call load_catalog() first.")
+    return catalog
 
-    # --- Text features
-    corpus = [_feature_text(d) for d in _rows]
-    _vectorizer = TfidfVectorizer(
-        lowercase=True,
-        token_pattern=r"(?u)\b\w+\b",  # keep numbers & 1-char tokens
-        min_df=1,
-        stop_words=None,
-        ngram_range=(1, 2),           # optional: unigrams+bigrams
+def _vectorize(catalog: Catalog, docs: List[dict]):
+    """Vectorize docs with the catalog's fitted vocabulary and scaler (no refit)."""
+    X_text = catalog.vectorizer.transform([_feature_text(d, catalog.num_tokens) for d in docs])
+    if catalog.num_scaler is None:
+        X_num = csr_matrix((len(docs), 0), dtype=np.float32)
+    else:
+        num = np.array([_get_numeric(d) for d in docs], dtype=np.float32)
+        X_num = csr_matrix(catalog.num_scaler.transform(num), dtype=np.float32)
+    return hstack([X_text, X_num], format="csr", dtype=np.float32)
+
+def _with_appended(catalog: Catalog, docs: List[dict]) -> Catalog:
+    """`catalog` plus the new qualifying films from docs in its delta segment (itself if none)."""
+    fresh = []
+    seen = set()
+    for d in docs:
+        title = (d.get("Title") or d.get("title") or "").strip()
+        key = film_key(title, d.get("Year") or d.get("year"))
+        if not title or key in seen or catalog.by_title_year(key) is not None:
+            continue
+        votes = d.get("Vote Count") or d.get("votes") or 0
+        try:
+            votes = int(votes)
+        except Exception:
+            votes = 0
+        if votes <= 100_000:  # same cut as the load_catalog query
+            continue
+        seen.add(key)
+        fresh.append(d)
+    if not fresh:
+        return catalog
+
+    X_new = _vectorize(catalog, fresh)
+    t2i, ty2i = _index_rows(fresh, offset=len(catalog))
+    return dataclasses.replace(
+        catalog,
+        delta_rows=catalog.delta_rows + tuple(fresh),
+        delta_title2idx={**catalog.delta_title2idx, **t2i},
+        delta_titleyear2idx={**catalog.delta_titleyear2idx, **ty2i},
+        delta_features=X_new if catalog.delta_features is None
+        else vstack([catalog.delta_features, X_new], format="csr"),
     )
-    X_text = _vectorizer.fit_transform(corpus)
 
-    # --- Numeric features (scaled) and hstack with text
-    num = np.array([_get_numeric(d) for d in _rows], dtype=np.float32)  # shape (N,3)
-    if num.size == 0:
-        X_num = csr_matrix((len(_rows), 0))
-    else:
-        scaler = StandardScaler(with_mean=False)  # with_mean=False for sparse compatibility
-        # We’ll scale dense then convert to sparse; keep it simple & small (#cols=3)
-        num_scaled = StandardScaler().fit_transform(num)
-        X_num = csr_matrix(num_scaled)
+def append_to_catalog(docs: List[dict]) -> int:
+    """
+    Add newly discovered films without refitting TF-IDF.
+    New rows go into a small delta segment scored alongside the main matrix;
+    the next full load_catalog() folds them back in. Returns rows added.
+    """
+    global _catalog
+    if _catalog is None:
+        return 0
+    if _appends_during_load is not None:
+        _appends_during_load.extend(docs)
+    before = len(_catalog)
+    _catalog = _with_appended(_catalog, docs)
+    return len(_catalog) - before
+
+def catalog_version() -> int:
+    """Identifies the current full build; appended delta rows and no-op refreshes don't change it."""
+    return _catalog.version if _catalog is not None else 0
+
+def catalog_needs_compaction() -> bool:
+    """
+    True when the catalog is missing, older than CATALOG_MAX_AGE_S, or the delta
+    segment has grown past _compact_after rows.
+    """
+    if _catalog is None:
+        return True
+    if CATALOG_MAX_AGE_S and time.monotonic() - _catalog.built_at >= CATALOG_MAX_AGE_S:
+        return True
+    return len(_catalog.delta_rows) >= _compact_after
+
+def _csr_bytes(m) -> int:
+    return 0 if m is None else int(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes)
+
+def catalog_stats() -> Dict[str, Any]:
+    """Memory footprint of the feature matrix, for trading memory against quality."""
+    catalog = _catalog
+    if catalog is None:
+        return {"loaded": False}
+    vocab = getattr(catalog.vectorizer, "vocabulary_", None)
+    delta = catalog.delta_features
+    return {
+        "loaded": True,
+        "version": catalog.version,
+        "vectorizer": "hashing" if isinstance(catalog.vectorizer, HashingVectorizer) else "tfidf",
+        "rows": len(catalog),
+        "main_rows": catalog.n_main,
+        "delta_rows": len(catalog.delta_rows),
+        "n_features": int(catalog.features.shape[1]),
+        "vocabulary_size": len(vocab) if vocab is not None else 0,
+        "nnz": int(catalog.features.nnz) + (0 if delta is None else int(delta.nnz)),
+        "matrix_bytes": _csr_bytes(catalog.features) + _csr_bytes(delta),
+        "dtype": str(catalog.features.dtype),
+        "build_seconds": round(catalog.build_seconds, 3),
+    }
 
-    _features = hstack([X_text, X_num], format="csr")
-    _catalog_loaded = True
+def _feature_rows(catalog: Catalog, idx: List[int]):
+    """Gather feature rows by catalog index across the main and delta segments."""
+    if catalog.delta_features is None:
+        return catalog.features[idx]
+    idx = np.asarray(idx)
+    main = idx < catalog.n_main
+    if main.all():
+        return catalog.features[idx]
+    out = vstack([catalog.features[idx[main]], catalog.delta_features[idx[~main] - catalog.n_main]], format="csr")
+    order = np.argsort(np.concatenate([np.flatnonzero(main), np.flatnonzero(~main)]), kind="stable")
+    return out[order]
+
+def _score_all(catalog: Catalog, user_vec) -> np.ndarray:
+    """Dot every catalog row (main, then delta) with the user profile."""
+    scores = catalog.features @ user_vec
+    if catalog.delta_features is not None:
+        scores = np.concatenate([scores, catalog.delta_features @ user_vec])
+    return scores
 
 # ----------------- scoring utils -----------------
 def _normalize_weights(user_movies: List[Dict[str, Any]]) -> List[float]:
@@ -144,7 +461,7 @@ def _normalize_weights(user_movies: List[Dict[str, Any]]) -> List[float]:
     mid = scale_max / 2.0
     return [((m.get("user_rating", mid)) - mid) / mid for m in user_movies]
 
-def _map_movie_to_row(movie: Dict[str, Any]) -> Optional[int]:
+def _map_movie_to_row(catalog: Catalog, movie: Dict[str, Any]) -> Optional[int]:
     """
     Title-based mapping only (no external IDs).
     Try title+year key -> exact lower -> normalized -> fuzzy.
@@ -155,78 +472,133 @@ def _map_movie_to_row(movie: Dict[str, Any]) -> Optional[int]:
     year  = movie.get("year") or movie.get("Year")
 
     # 1) title+year
-    k_ty = _mk_key(title, year)
-    if k_ty in _titleyear2idx:
-        return _titleyear2idx[k_ty]
+    r = catalog.by_title_year(film_key(title, year))
+    if r is not None:
+        return r
 
     # 2) title-only
     key = title.lower()
-    if key in _title2idx:
-        return _title2idx[key]
-    nkey = _norm_title(title)
-    if nkey in _title2idx:
-        return _title2idx[nkey]
+    r = catalog.by_title(key)
+    if r is not None:
+        return r
+    nkey = norm_title(title)
+    r = catalog.by_title(nkey)
+    if r is not None:
+        return r
 
     # 3) fuzzy
-    if _title2idx:
-        close = difflib.get_close_matches(nkey or key, list(_title2idx.keys()), n=1, cutoff=0.82)
+    candidates = catalog.title_keys + list(catalog.delta_title2idx) if catalog.delta_title2idx else catalog.title_keys
+    if candidates:
+        close = difflib.get_close_matches(nkey or key, candidates, n=1, cutoff=0.82)
         if close:
-            return _title2idx[close[0]]
+            return catalog.by_title(close[0])
     return None
 
-def _build_user_profile(rated_rows: List[int], weights: List[float]):
+def _build_user_profile(catalog: Catalog, rated_rows: List[int], weights: List[float]):
     """
     Weighted sum of feature rows -> L2-normalized user profile vector.
     """
     if not rated_rows:
         return None
-    rows = _features[rated_rows]  # (R,D) sparse
+    rows = _feature_rows(catalog, rated_rows)  # (R,D) sparse
     w = np.asarray(weights, dtype=np.float32).reshape(-1, 1)
     prof = rows.T @ w             # (D,1)
     prof = prof.ravel()
     n = np.linalg.norm(prof)
     return (prof / n) if n > 0 else prof
 
-# ----------------- public API -----------------
-def recommend_from_ratings(user_movies: List[Dict[str, Any]], k: int = 10, min_votes: int = 0) -> List[Dict[str, Any]]:
-    if not _catalog_loaded:
-        raise RuntimeError("Catalog not loaded; call load_catalog() first.")
-
+def _map_ratings(catalog: Catalog, user_movies: List[Dict[str, Any]]):
+    """Catalog rows for the rated movies that map, plus the matching movies."""
     rated_rows: List[int] = []
     matched: List[Dict[str, Any]] = []
     for m in user_movies:
-        r = _map_movie_to_row(m)
+        r = _map_movie_to_row(catalog, m)
         if r is not None:
             rated_rows.append(r)
             matched.append(m)
+    return rated_rows, matched
+
+def _row_key(catalog: Catalog, i: int) -> str:
+    d = catalog.row(i)
+    return film_key((d.get("Title") or d.get("title") or "").strip(), d.get("Year") or d.get("year"))
+
+# ----------------- public API -----------------
+# `catalog` defaults to the published one; callers in executor threads must pass the
+# snapshot they got from current_catalog() on the event loop.
+def profile_terms(user_movies: List[Dict[str, Any]], catalog: Optional[Catalog] = None) -> List[List[Any]]:
+    """
+    [catalog "title::year" key, weight] pairs for the rated movies that map.
+    This is the expensive (possibly fuzzy) title-mapping step; the keys are stable across
+    catalog builds and workers, so callers store them and rebuild profiles by exact lookup.
+    """
+    catalog = _require(catalog)
+    rated_rows, matched = _map_ratings(catalog, user_movies)
+    return [[_row_key(catalog, r), float(w)] for r, w in zip(rated_rows, _normalize_weights(matched))]
+
+def profile_row_from_terms(terms: List[List[Any]], max_nnz: int | None = None,
+                           catalog: Optional[Catalog] = None):
+    """
+    Sparse float32 (1, D) L2-normalized profile from profile_terms() output, or None if
+    no key is in the catalog. Keys are resolved by exact lookup only.
+    max_nnz keeps only the largest-magnitude weights so stored profiles stay small.
+    """
+    catalog = _require(catalog)
+    rated_rows: List[int] = []
+    weights: List[float] = []
+    for key, w in terms:
+        r = catalog.by_title_year(key)
+        if r is not None:
+            rated_rows.append(r)
+            weights.append(w)
+    if not rated_rows:
+        return None
+    w = csr_matrix(np.asarray(weights, dtype=np.float32).reshape(1, -1))
+    prof = (w @ _feature_rows(catalog, rated_rows)).tocsr()   # (1,D) sparse
+    prof.eliminate_zeros()
+    if max_nnz and prof.nnz > max_nnz:
+        keep = np.argpartition(-np.abs(prof.data), max_nnz - 1)[:max_nnz]
+        prof = csr_matrix((prof.data[keep], (np.zeros(max_nnz, dtype=np.int32), prof.indices[keep])),
+                          shape=prof.shape, dtype=np.float32)
+    n = np.sqrt(prof.multiply(prof).sum())
+    if n == 0:
+        return None
+    return (prof / n).astype(np.float32)   # scalar division upcasts to float64
+
+def user_profile_row(user_movies: List[Dict[str, Any]], max_nnz: int | None = None,
+                     catalog: Optional[Catalog] = None):
+    """Sparse float32 (1, D) L2-normalized profile for a rating history, or None if nothing maps."""
+    catalog = _require(catalog)
+    return profile_row_from_terms(profile_terms(user_movies, catalog), max_nnz, catalog)
+
+def rank_from_ratings(user_movies: List[Dict[str, Any]], depth: int = 10, min_votes: int = 0):
+    """
+    Best `depth` catalog rows for a rating history, as (row indices int32, scores float32)
+    in descending score order. Hydrate slices of it with hydrate_rows().
+    """
+    catalog = _require(None)
+
+    rated_rows, matched = _map_ratings(catalog, user_movies)
 
     if not rated_rows:
         # Cold-start fallback: top-K by votes
         ranked = sorted(
-            range(len(_rows)),
-            key=lambda i: (int((_rows[i].get("Vote Count") or _rows[i].get("votes") or 0))),
+            range(len(catalog)),
+            key=lambda i: (int((catalog.row(i).get("Vote Count") or catalog.row(i).get("votes") or 0))),
             reverse=True
-        )[:k]
-        return [{
-            "title": _rows[i].get("Title") or _rows[i].get("title"),
-            "poster": _rows[i].get("Poster") or _rows[i].get("poster"),
-            "year": _rows[i].get("Year") or _rows[i].get("year"),
-            "genres": _rows[i].get("Genres") or _rows[i].get("genres", []),
-            "score": 0.0,
-            "average": _rows[i].get("Average Score") or _rows[i].get("average"),
-            "votes": _rows[i].get("Vote Count") or _rows[i].get("votes"),
-        } for i in ranked]
+        )[:depth]
+        return np.asarray(ranked, dtype=np.int32), np.zeros(len(ranked), dtype=np.float32)
 
+    empty = (np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32))
     weights = _normalize_weights(matched)
-    user_vec = _build_user_profile(rated_rows, weights)
+    user_vec = _build_user_profile(catalog, rated_rows, weights)
     if user_vec is None or user_vec.shape[0] == 0:
-        return []
+        return empty
 
     # Cosine similarity via sparse matvec
-    scores = (_features @ user_vec).astype(np.float32).ravel()
+    scores = _score_all(catalog, user_vec).astype(np.float32).ravel()
 
     # Blend a touch of popularity to avoid ultra-obscure ties (optional)
-    pop = np.array([int((r.get("Vote Count") or r.get("votes") or 0)) for r in _rows], dtype=np.float32)
+    pop = np.array([int((r.get("Vote Count") or r.get("votes") or 0)) for r in catalog.all_rows()], dtype=np.float32)
     pop = np.tanh(pop / 10000.0)
     scores = 0.9 * scores + 0.1 * pop
 
@@ -236,7 +608,7 @@ def recommend_from_ratings(user_movies: List[Dict[str, Any]], k: int = 10, min_v
 
     # Optional popularity filter
     if min_votes > 0:
-        for i, d in enumerate(_rows):
+        for i, d in enumerate(catalog.all_rows()):
             vc = d.get("Vote Count") or d.get("votes") or 0
             try:
                 vc = int(vc)
@@ -248,23 +620,30 @@ def recommend_from_ratings(user_movies: List[Dict[str, Any]], k: int = 10, min_v
     # Top-K
     valid = np.isfinite(scores)
     if not np.any(valid):
-        return []
-    k = min(k, int(valid.sum()))
-    top_idx = np.argpartition(-scores, kth=k-1)[:k]
+        return empty
+    depth = min(depth, int(valid.sum()))
+    top_idx = np.argpartition(-scores, kth=depth-1)[:depth]
     top_idx = top_idx[np.argsort(-scores[top_idx])]
+    top_idx = top_idx[np.isfinite(scores[top_idx])]
+    return top_idx.astype(np.int32), scores[top_idx].astype(np.float32)
 
+def hydrate_rows(idx, scores) -> List[Dict[str, Any]]:
+    """Response dicts for ranked catalog rows."""
+    catalog = _require(None)
     recs: List[Dict[str, Any]] = []
-    for i in top_idx:
-        if not np.isfinite(scores[i]):
-            continue
-        d = _rows[i]
+    for i, score in zip(idx, scores):
+        d = catalog.row(int(i))
         recs.append({
             "title":  d.get("Title")  or d.get("title"),
             "poster": d.get("Poster") or d.get("poster"),
             "year":   d.get("Year")   or d.get("year"),
             "genres": d.get("Genres") or d.get("genres", []),
-            "score":  float(scores[i]),
+            "score":  float(score),
             "average": d.get("Average Score") or d.get("average"),
             "votes":   d.get("Vote Count")    or d.get("votes"),
         })
     return recs
+
+def recommend_from_ratings(user_movies: List[Dict[str, Any]], k: int = 10, min_votes: int = 0) -> List[Dict[str, Any]]:
+    idx, scores = rank_from_ratings(user_movies, depth=k, min_votes=min_votes)
+    return hydrate_rows(idx, scores)
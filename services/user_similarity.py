@@ -0,0 +1,194 @@
+"""
+"Users like you": nearest users by taste profile.
+
+Each stored user gets a sparse float32 L2-normalized profile pruned to
+USER_PROFILE_NNZ weights. Profiles are built from the `profile_terms` stored on
+their UserRatings doc at upsert time (catalog keys + weights, see
+recommender.profile_terms), so a rebuild is exact dict lookups plus sparse
+sums and never re-runs fuzzy title matching.
+Profiles live in a stacked base matrix plus a small delta of users re-profiled
+since the last compaction (same layout as the catalog's delta segment), so a
+query is one sparse matvec over the base and a tiny one over the delta.
+When the catalog's feature space changes the index is rebuilt in the
+background, off the event loop, while the previous index keeps serving.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+
+from core.metrics import timed
+from services import recommender
+
+USER_PROFILE_NNZ = int(os.getenv("USER_PROFILE_NNZ", "512"))
+_COMPACT_AFTER = 256
+
+_index_version: Optional[int] = None           # recommender.catalog_version() the index was built for
+_base = None                                   # sparse (U, D) profiles
+_base_users: List[str] = []
+_base_row: Dict[str, int] = {}
+_delta: Dict[str, Optional[csr_matrix]] = {}   # username -> newer profile (None = no longer profiled)
+_build_task: Optional[asyncio.Task] = None
+_updates_during_build: Dict[str, List[List[Any]]] = {}   # username -> terms upserted mid-rebuild
+
+
+def _index_current() -> bool:
+    return _index_version is not None and _index_version == recommender.catalog_version()
+
+
+def _building() -> bool:
+    return _build_task is not None and not _build_task.done()
+
+
+def _build_profiles(entries, catalog):
+    """(username, terms) pairs -> (usernames, profile rows); CPU-bound, runs in an executor."""
+    users, profiles = [], []
+    for username, terms in entries:
+        prof = recommender.profile_row_from_terms(terms, USER_PROFILE_NNZ, catalog)
+        if prof is not None:
+            users.append(username)
+            profiles.append(prof)
+    return users, profiles
+
+
+async def load_user_index(user_ratings_collection) -> int:
+    """Rebuild every user's profile from stored profile_terms against the current catalog."""
+    global _index_version, _base, _base_users, _base_row, _delta
+    # Executor work reads only this snapshot, never the recommender's live state
+    catalog = recommender.current_catalog()
+    if catalog is None:
+        raise RuntimeError("Catalog not loaded; call load_catalog() first.")
+    version = catalog.version
+    loop = asyncio.get_running_loop()
+    entries = []
+    with timed("similarity.build"):
+        async for doc in user_ratings_collection.find(
+            {"profile_terms": {"$type": "array"}}, {"_id": 0, "lb_username": 1, "profile_terms": 1}
+        ):
+            if doc.get("lb_username"):
+                entries.append((doc["lb_username"], doc["profile_terms"]))
+
+        # Users synced before profile_terms existed (or with no catalog loaded): map once and store
+        async for doc in user_ratings_collection.find(
+            {"profile_terms": {"$not": {"$type": "array"}}}, {"_id": 0, "lb_username": 1, "ratings": 1}
+        ):
+            username = doc.get("lb_username")
+            if not username:
+                continue
+            terms = await loop.run_in_executor(None, recommender.profile_terms, doc.get("ratings") or [], catalog)
+            await user_ratings_collection.update_one(
+                {"lb_username": username, "profile_terms": {"$not": {"$type": "array"}}},
+                {"$set": {"profile_terms": terms}},
+            )
+            entries.append((username, terms))
+
+        users, profiles = await loop.run_in_executor(None, _build_profiles, entries, catalog)
+
+    if version != recommender.catalog_version():
+        # Catalog rebuilt while we were working; the next query starts another rebuild
+        return 0
+    _base = vstack(profiles, format="csr") if profiles else None
+    _base_users = users
+    _base_row = {u: i for i, u in enumerate(users)}
+    _delta = {}
+    _index_version = version
+    pending = dict(_updates_during_build)
+    _updates_during_build.clear()
+    for username, terms in pending.items():
+        _delta[username] = recommender.profile_row_from_terms(terms, USER_PROFILE_NNZ)
+    if len(_delta) >= _COMPACT_AFTER:
+        _compact()
+    return len(users)
+
+
+async def _run_build(user_ratings_collection):
+    try:
+        n = await load_user_index(user_ratings_collection)
+        print(f"[Similarity] index built: users={n} catalog_version={_index_version}")
+    except Exception as e:
+        print(f"[Similarity] index build failed: {e}")
+
+
+def ensure_user_index(user_ratings_collection) -> bool:
+    """
+    Start a background rebuild if the index is missing or from an older catalog.
+    Returns True if some index (possibly the previous one) can answer queries now.
+    """
+    global _build_task
+    if not _index_current() and not _building():
+        _build_task = asyncio.create_task(_run_build(user_ratings_collection))
+    return _index_version is not None
+
+
+def _compact() -> None:
+    """Fold the delta into the base matrix."""
+    global _base, _base_users, _base_row, _delta
+    users, profiles = [], []
+    for i, u in enumerate(_base_users):
+        if u not in _delta:
+            users.append(u)
+            profiles.append(_base[i])
+    for u, prof in _delta.items():
+        if prof is not None:
+            users.append(u)
+            profiles.append(prof)
+    _base = vstack(profiles, format="csr") if profiles else None
+    _base_users = users
+    _base_row = {u: i for i, u in enumerate(users)}
+    _delta = {}
+
+
+def update_user_profile(username, terms) -> None:
+    """Re-profile one user from freshly stored profile_terms (cheap: no title mapping)."""
+    if _building():
+        _updates_during_build[username] = terms
+    if not _index_current():
+        return
+    _delta[username] = recommender.profile_row_from_terms(terms, USER_PROFILE_NNZ)
+    if len(_delta) >= _COMPACT_AFTER:
+        _compact()
+
+
+def _profile_of(username):
+    if username in _delta:
+        return _delta[username]
+    i = _base_row.get(username)
+    return None if i is None else _base[i]
+
+
+def similar_users(username, k=10) -> Optional[List[Dict[str, Any]]]:
+    """Top-k users by cosine similarity of taste profiles; None if the user has no profile."""
+    q = _profile_of(username)
+    if q is None:
+        return None
+
+    with timed("similarity.query"):
+        users: List[str] = []
+        parts = []
+        if _base is not None:
+            base_scores = (_base @ q.T).toarray().ravel()
+            for u in _delta:                  # stale base rows are superseded by the delta
+                i = _base_row.get(u)
+                if i is not None:
+                    base_scores[i] = -np.inf
+            users.extend(_base_users)
+            parts.append(base_scores)
+        fresh = [(u, p) for u, p in _delta.items() if p is not None]
+        if fresh:
+            users.extend(u for u, _ in fresh)
+            parts.append((vstack([p for _, p in fresh], format="csr") @ q.T).toarray().ravel())
+        if not parts:
+            return []
+        scores = np.concatenate(parts)
+        scores[[i for i, u in enumerate(users) if u == username]] = -np.inf
+
+        valid = np.isfinite(scores)
+        if not np.any(valid):
+            return []
+        k = min(k, int(valid.sum()))
+        top = np.argpartition(-scores, kth=k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+    return [{"username": users[i], "similarity": round(float(scores[i]), 4)} for i in top if np.isfinite(scores[i])]